@@ -0,0 +1,59 @@
+"""
+Frames/sec of every installed packet codec, eager and lazy (header-only).
+
+Usage: python -m benchmarks.codec [frames]
+"""
+import sys
+import time
+
+from vkmax.codec import available_codecs, get_codec
+
+
+# typical opcode 128 (new message) notification in a large group
+FRAME = (
+    '{"ver":11,"cmd":0,"seq":1024,"opcode":128,"payload":{"chatId":-68093732121255,'
+    '"unread":3,"mark":1751234567890,"message":{"sender":123456789,"id":"114763846571234567",'
+    '"time":1751234567890,"text":"Привет! Как дела? Встречаемся в 19:00 у входа","type":"USER",'
+    '"cid":1751234567000,"attaches":[],"elements":[],"reactionInfo":{"totalCount":2,'
+    '"counters":[{"reaction":"👍","count":2}]}},"ttl":false,"prevMessageId":"114763846570000000"}}'
+).encode()  # the client receives raw UTF-8 frames
+
+REQUEST = {
+    "ver": 11,
+    "cmd": 0,
+    "seq": 1024,
+    "opcode": 64,
+    "payload": {
+        "chatId": -68093732121255,
+        "message": {"text": "Привет!", "cid": 1751234567000, "elements": [], "attaches": []},
+        "notify": True,
+    },
+}
+
+
+def bench(name: str, frames: int, lazy: bool = False):
+    codec = get_codec(name, lazy=lazy)
+
+    started = time.perf_counter()
+    for _ in range(frames):
+        codec.decode(FRAME)
+    decode_rate = frames / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(frames):
+        codec.encode(REQUEST)
+    encode_rate = frames / (time.perf_counter() - started)
+
+    label = f'{name} (lazy)' if lazy else name
+    print(f'{label:>15}: decode {decode_rate:>12,.0f} frames/s   encode {encode_rate:>12,.0f} frames/s')
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    for name in available_codecs():
+        bench(name, frames)
+        bench(name, frames, lazy=True)
+
+
+if __name__ == '__main__':
+    main()
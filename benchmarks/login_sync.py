@@ -0,0 +1,40 @@
+"""
+Login payload size and latency, full sync vs. incremental sync.
+Needs a real session saved as in README, by `FileSessionStore` in max_session.txt
+
+Usage: python -m benchmarks.login_sync [session_file]
+"""
+import asyncio
+import sys
+
+from vkmax.client import MaxClient
+from vkmax.sessions import FileSessionStore
+
+
+async def login(device_id: str, token: str, sync_markers: dict = None) -> MaxClient:
+    client = MaxClient()
+    await client.connect()
+    await client.login_by_token(token, device_id, sync_markers=sync_markers)
+    return client
+
+
+async def main():
+    session = FileSessionStore(sys.argv[1] if len(sys.argv) > 1 else 'max_session.txt').load()
+    # markers of the saved session are ignored, the first login is a full sync
+    device_id, token = session.device_id, session.token
+
+    client = await login(device_id, token)
+    full = client.stats()["login"]["full"]
+    sync_markers = client.sync_markers
+    await client.disconnect()
+
+    client = await login(device_id, token, sync_markers)
+    incremental = client.stats()["login"]["incremental"]
+    await client.disconnect()
+
+    for name, measurement in (("full", full), ("incremental", incremental)):
+        print(f'{name:>11}: {measurement["bytes"]:>10,} bytes   {measurement["latency"] * 1000:>8.1f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
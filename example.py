@@ -1,11 +1,11 @@
 import asyncio
 import logging
 import sys
-from pathlib import Path
-
 import aiohttp
 
 from vkmax.client import MaxClient
+from vkmax.packet import MaxPacket
+from vkmax.sessions import FileSessionStore
 from vkmax.functions.messages import edit_message
 
 
@@ -29,54 +29,46 @@ async def get_weather(city: str) -> str:
     return await response.text()
 
 
-async def packet_callback(client: MaxClient, packet: dict):
-    if packet['opcode'] == 128:
-        message_text: str = packet['payload']['message']['text']
-        if message_text not in ['.info', '.weather']:
-            return
+async def on_message(client: MaxClient, packet: MaxPacket):
+    message_text: str = packet.payload['message']['text']
+    if message_text not in ['.info', '.weather']:
+        return
 
-        if message_text == ".info":
-            text = "Userbot connected"
+    if message_text == ".info":
+        text = "Userbot connected"
 
-        elif ".weather" in message_text:
-            city = message_text.split()[1]
-            text = await get_weather(city)
+    elif ".weather" in message_text:
+        city = message_text.split()[1]
+        text = await get_weather(city)
 
-        await edit_message(
-            client,
-            packet["payload"]["chatId"],
-            packet["payload"]["message"]["id"],
-            text
-        )
+    await edit_message(
+        client,
+        packet.payload["chatId"],
+        packet.payload["message"]["id"],
+        text
+    )
 
 
 async def main():
-    client = MaxClient()
+    # device id, login token and cached chats/users are kept between runs,
+    # so restarts resume with an incremental sync
+    client = MaxClient(session_store=FileSessionStore('max_session.txt'))
     await client.connect()
 
-    session_file = Path('max_session.txt')
+    try:
+        logged_in = await client.login_from_session()
+    except:
+        print("Couldn't login by token")
+        logged_in = False
 
-    if not session_file.exists():
+    if not logged_in:
         phone_number = input('Enter your phone number: ')
         sms_token = await client.send_code(phone_number)
         sms_code = int(input('Enter SMS code: '))
-        account_data = await client.sign_in(sms_token, sms_code)
-
-        device_id = client.device_id
-        login_token = account_data['payload']['tokenAttrs']['LOGIN']['token']
-
-        # save device uuid and auth token delimited by newline
-        session_file.write_text(f'{device_id}\n{login_token}')
-
-    else:
-        contents = session_file.read_text()
-        device_id, login_token = contents.split('\n', maxsplit=1)
-        try:
-            await client.login_by_token(login_token, device_id)
-        except:
-            print("Couldn't login by token")
+        await client.sign_in(sms_token, sms_code)
 
-    await client.set_callback(packet_callback)
+    # opcode 128 is a new message notification
+    client.add_handler(on_message, opcode=128)
 
     await asyncio.Future()  # run forever
 
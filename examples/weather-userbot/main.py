@@ -5,9 +5,9 @@ import requests
 import sys
 
 from vkmax.client import MaxClient
+from vkmax.packet import MaxPacket
 from vkmax.functions.messages import edit_message
-
-from pathlib import Path
+from vkmax.sessions import FileSessionStore
 
 date_format = '%d.%m.%Y %H:%M:%S'
 logging_format = '[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s'
@@ -28,50 +28,44 @@ async def get_weather(city: str) -> str:
     return response.text
 
 
-async def packet_callback(client: MaxClient, packet: dict):
-    if packet['opcode'] == 128:
-        message_text: str = packet['payload']['message']['text']
-        if message_text not in ['.info', '.weather']:
-            return
+async def on_message(client: MaxClient, packet: MaxPacket):
+    message_text: str = packet.payload['message']['text']
+    if message_text not in ['.info', '.weather']:
+        return
 
-        if message_text == ".info":
-            text = "Userbot connected"
+    if message_text == ".info":
+        text = "Userbot connected"
 
-        elif ".weather" in message_text:
-            city = message_text.split()[1]
-            text = await get_weather(city)
+    elif ".weather" in message_text:
+        city = message_text.split()[1]
+        text = await get_weather(city)
 
-        await edit_message(
-            client,
-            packet["payload"]["chatId"],
-            packet["payload"]["message"]["id"],
-            text
-        )
+    await edit_message(
+        client,
+        packet.payload["chatId"],
+        packet.payload["message"]["id"],
+        text
+    )
 
 
 async def main():
-    client = MaxClient()
+    client = MaxClient(session_store=FileSessionStore('max_session.txt'))
 
     await client.connect()
 
-    login_token_file = Path('login_token.txt')
-
-    if login_token_file.exists():
-        login_token_from_file = login_token_file.read_text(encoding='utf-8').strip()
-        try:
-            await client.login_by_token(login_token_from_file)
-        except:
-            print("Couldn't login by token. Falling back to SMS login")
+    try:
+        logged_in = await client.login_from_session()
+    except:
+        print("Couldn't login by token. Falling back to SMS login")
+        logged_in = False
 
-    else:
+    if not logged_in:
         sms_login_token = await client.send_code('+79294066397')
         sms_code = int(input('Enter SMS code: '))
-        account_data = await client.sign_in(sms_login_token, sms_code)
-
-        login_token = account_data['payload']['tokenAttrs']['LOGIN']['token']
-        login_token_file.write_text(login_token, encoding='utf-8')
+        await client.sign_in(sms_login_token, sms_code)
 
-    await client.set_callback(packet_callback)
+    # opcode 128 is a new message notification
+    client.add_handler(on_message, opcode=128)
 
     await asyncio.Future()  # run forever
 
@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from vkmax.loaders import TTLCache
+from vkmax.ratelimit import is_flood_error
+from vkmax.singleflight import SingleFlight
+
+PathLike = Union[str, os.PathLike]
+
+_MISSING = object()
+
+_ATTACHMENT_ERROR_RE = re.compile(r'attach|token|photo|video|file|upload|expired', re.IGNORECASE)
+
+
+def is_attachment_error(payload: dict[str, Any]) -> bool:
+    """Whether a send response rejects the attachment itself, not the chat or the request rate"""
+    if is_flood_error(payload):
+        return False
+    error = payload.get("error")
+    return isinstance(error, str) and _ATTACHMENT_ERROR_RE.search(error) is not None
+
+
+def file_digest(path: PathLike, chunk_size: int = 2 ** 20) -> str:
+    """SHA-256 of the file contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AttachmentCache:
+    """
+    Attachment objects (`photoToken`, `fileId`) of uploaded content, keyed by content hash.
+
+    Sending the same bytes again reuses the attachment instead of uploading it;
+    if the server rejects a cached attachment it is dropped and the content re-uploaded.
+    Pass to `MaxClient(attachment_cache=...)`.
+    """
+
+    def __init__(
+        self,
+        path: Optional[PathLike] = None,
+        ttl: Optional[float] = 24 * 3600,
+        maxsize: int = 10_000,
+    ):
+        """
+        :param path: SQLite file keeping entries between runs, None for memory only
+        :param ttl: Seconds an attachment is reused, None for no expiry
+        :param maxsize: Entries kept in memory
+        """
+        self._path = str(path) if path is not None else None
+        self._ttl = ttl
+        self._memory: TTLCache = TTLCache(maxsize, ttl)
+        # digests of unchanged files are not recomputed
+        self._digests: TTLCache = TTLCache(maxsize, ttl=None)
+        # sends of the same content at the same time share one upload
+        self._uploads = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+        if self._path is not None:
+            with self._connect() as db:
+                db.execute("""
+                    CREATE TABLE IF NOT EXISTS attachments (
+                        key TEXT PRIMARY KEY,
+                        attach TEXT NOT NULL,
+                        expires_at REAL
+                    )
+                """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path)
+
+    @staticmethod
+    def key(kind: str, digest: str, filename: Optional[str] = None) -> str:
+        # file attachments carry the name given at upload
+        if filename is not None:
+            return f"{kind}:{filename}:{digest}"
+        return f"{kind}:{digest}"
+
+    async def digest(self, path: PathLike) -> str:
+        """Content hash of the file, cached by path, size and modification time"""
+        stat = os.stat(path)
+        file_key = (os.fspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(file_key)
+        if digest is None:
+            digest = await asyncio.to_thread(file_digest, path)
+            self._digests.set(file_key, digest)
+        return digest
+
+    async def get(self, key: str) -> Optional[dict]:
+        attach = self._memory.get(key, _MISSING)
+        if attach is _MISSING and self._path is not None:
+            attach, expires_at = await asyncio.to_thread(self._load, key)
+            if attach is not None:
+                ttl = None if expires_at is None else expires_at - time.time()
+                self._memory.set(key, attach, ttl)
+
+        if attach is _MISSING or attach is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return attach
+
+    async def put(self, key: str, attach: dict):
+        self._memory.set(key, attach)
+        if self._path is not None:
+            expires_at = time.time() + self._ttl if self._ttl is not None else None
+            await asyncio.to_thread(self._store, key, attach, expires_at)
+
+    async def upload(self, key: str, upload: Callable[[], Awaitable[dict]]) -> dict:
+        """Uploads the content and caches its attachment, concurrent calls for a key share one upload"""
+
+        async def upload_and_put() -> dict:
+            attach = await upload()
+            await self.put(key, attach)
+            return attach
+
+        return await self._uploads.do(key, upload_and_put)
+
+    async def reject(self, key: str):
+        """Drops an attachment the server did not accept"""
+        self.rejected += 1
+        self._memory.invalidate(key)
+        if self._path is not None:
+            await asyncio.to_thread(self._delete, key)
+
+    def _load(self, key: str) -> tuple[Optional[dict], Optional[float]]:
+        db = self._connect()
+        try:
+            row = db.execute(
+                "SELECT attach, expires_at FROM attachments WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        finally:
+            db.close()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def _store(self, key: str, attach: dict, expires_at: Optional[float]):
+        db = self._connect()
+        try:
+            with db:
+                db.execute("DELETE FROM attachments WHERE expires_at <= ?", (time.time(),))
+                db.execute(
+                    "INSERT OR REPLACE INTO attachments VALUES (?, ?, ?)",
+                    (key, json.dumps(attach), expires_at),
+                )
+        finally:
+            db.close()
+
+    def _delete(self, key: str):
+        db = self._connect()
+        try:
+            with db:
+                db.execute("DELETE FROM attachments WHERE key = ?", (key,))
+        finally:
+            db.close()
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        uploads = self._uploads.stats()
+        return {
+            "size": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "hit_rate": self.hits / total if total else 0.0,
+            "uploading": uploads["in_flight"],
+            "shared_uploads": sum(uploads["hits"].values()),
+        }
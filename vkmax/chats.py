@@ -0,0 +1,82 @@
+from typing import Any, Iterable, Optional
+
+from vkmax.loaders import BatchLoader, TTLCache
+
+# server notification about a created or changed chat
+CHAT_UPDATE_OPCODE = 135
+
+
+class ChatRegistry(BatchLoader[int, dict]):
+    """
+    Chat metadata kept in memory.
+
+    Seeded from the login response, refreshed by chat update notifications,
+    unknown chats are fetched with batched opcode 48 requests.
+    """
+
+    def __init__(
+        self,
+        client,
+        window: float = 0.005,
+        max_batch: int = 100,
+        cache_size: int = 100_000,
+    ):
+        # chats are kept fresh by notifications, so entries never expire
+        super().__init__(self._fetch_chats, window, max_batch, TTLCache(cache_size, ttl=None))
+        self._client = client
+
+    async def _fetch_chats(self, chat_ids: list[int]) -> dict[int, dict]:
+        response = await self._client.invoke_method(
+            opcode=48,
+            payload={
+                "chatIds": chat_ids
+            }
+        )
+        return {
+            chat["id"]: chat
+            for chat in response.payload.get("chats", [])
+            if "id" in chat
+        }
+
+    def ingest(self, chats: Iterable[dict]):
+        for chat in chats:
+            if "id" in chat:
+                self.prime(chat["id"], chat)
+
+    def ingest_login(self, payload: dict[str, Any]):
+        """Stores chats from the opcode 19 login response"""
+        self.ingest(payload.get("chats", []))
+
+    async def on_chat_update(self, client, packet):
+        """Packet handler applying chat notifications"""
+        chat = packet.payload.get("chat")
+        if chat:
+            self.ingest((chat,))
+
+    # --- O(1) lookups of known chats, None for unknown ones
+
+    def get(self, chat_id: int) -> Optional[dict]:
+        return self.cache.get(chat_id)
+
+    def title(self, chat_id: int) -> Optional[str]:
+        chat = self.get(chat_id)
+        return chat.get("title") if chat else None
+
+    def type(self, chat_id: int) -> Optional[str]:
+        """DIALOG, CHAT or CHANNEL"""
+        chat = self.get(chat_id)
+        return chat.get("type") if chat else None
+
+    def members_count(self, chat_id: int) -> Optional[int]:
+        chat = self.get(chat_id)
+        if not chat:
+            return None
+        if "participantsCount" in chat:
+            return chat["participantsCount"]
+        return len(chat.get("participants") or ())
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self.cache
+
+    def __len__(self) -> int:
+        return len(self.cache)
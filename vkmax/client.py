@@ -2,8 +2,10 @@ import asyncio
 import itertools
 import json
 import logging
+import random
+import time
 import uuid
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Collection, Optional, Union
 
 import aiohttp
 import websockets
@@ -11,11 +13,35 @@ from websockets.asyncio.client import ClientConnection
 
 from functools import wraps
 
+from vkmax.attachments import AttachmentCache
+from vkmax.chats import CHAT_UPDATE_OPCODE, ChatRegistry
+from vkmax.codec import PacketCodec, get_codec
+from vkmax.dispatcher import OVERFLOW_BLOCK, PacketDispatcher
+from vkmax.downloads import Downloader
+from vkmax.exceptions import ConnectionLost, LoginError, RequestTimeout
+from vkmax.journal import INBOUND, OUTBOUND, PacketJournal
+from vkmax.loaders import CONTACT_UPDATE_OPCODE, UserLoader
+from vkmax.packet import MaxPacket
+from vkmax.ratelimit import RateLimiter
+from vkmax.singleflight import SingleFlight
+from vkmax.transfers import TRANSFER_PROCESSED_OPCODE, TransferManager
+from vkmax.transport import TrafficCounter, deflate_extensions
+from vkmax.router import PacketHandler, PacketPredicate, PacketRouter
+from vkmax.sessions import SessionData, SessionStore
+from vkmax.writer import CONTROL_OPCODES, PRIORITY_CONTROL, PRIORITY_INTERACTIVE, FrameWriter
+
 WS_HOST = "wss://ws-api.oneme.ru/websocket"
 RPC_VERSION = 11
 APP_VERSION = "26.2.2"
 USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36"
 
+# read-only requests that are safe to send again after a reconnect
+REPLAY_OPCODES = frozenset((32, 48, 49, 59, 83, 88, 89))
+# lookups whose concurrent duplicates share one round trip
+DEDUP_OPCODES = frozenset((32, 48, 89))
+# login payload keys telling the server which state the client already has
+SYNC_MARKERS = ("chatsSync", "contactsSync", "presenceSync", "draftsSync")
+
 _logger = logging.getLogger(__name__)
 
 
@@ -30,19 +56,136 @@ def ensure_connected(method: Callable):
 
 
 class MaxClient:
-    def __init__(self):
+    def __init__(
+        self,
+        codec: Union[str, PacketCodec, None] = None,
+        lazy_packets: bool = False,
+        workers: int = 4,
+        queue_size: int = 1024,
+        overflow: str = OVERFLOW_BLOCK,
+        droppable_opcodes: Collection[int] = (),
+        block_timeout: Optional[float] = 5.0,
+        request_timeout: Optional[float] = 30.0,
+        auto_reconnect: bool = True,
+        reconnect_min_delay: float = 0.5,
+        reconnect_max_delay: float = 30.0,
+        reconnect_attempts: Optional[int] = None,
+        replay_opcodes: Collection[int] = REPLAY_OPCODES,
+        rate_limiter: Optional[RateLimiter] = None,
+        batch_frames: bool = False,
+        dedup_opcodes: Collection[int] = DEDUP_OPCODES,
+        compression: bool = True,
+        client_max_window_bits: Optional[int] = None,
+        server_max_window_bits: Optional[int] = None,
+        compression_memory_level: int = 5,
+        max_frame_size: Optional[int] = 2 ** 20,
+        session_store: Optional[SessionStore] = None,
+        journal: Optional[PacketJournal] = None,
+        transfer_timeout: Optional[float] = 600.0,
+        attachment_cache: Optional[AttachmentCache] = None,
+    ):
+        """
+        :param codec: Frame codec name ("json", "orjson", "msgspec"), instance,
+            or None to pick the fastest installed one
+        :param lazy_packets: Parse packet payloads only when they are accessed
+        :param workers: Number of handler workers. Packets of one chat are
+            handled sequentially, different chats in parallel
+        :param queue_size: Total number of packets waiting for handlers
+        :param overflow: What to do when the handler queue is full,
+            see `vkmax.dispatcher.OVERFLOW_POLICIES`. "block" stops reading the socket
+            until there is room, but still drops the oldest queued packet after `block_timeout`
+        :param droppable_opcodes: Opcodes dropped under the "drop_opcodes" policy
+        :param block_timeout: Seconds a full handler queue blocks the reader before a packet
+            is dropped, None never drops. A handler awaiting `invoke_method` while the queue
+            is full then deadlocks, as its response is read by the blocked reader
+        :param request_timeout: Default seconds to wait for a response, None waits forever
+        :param auto_reconnect: Restore a logged in session after the connection drops
+        :param reconnect_min_delay: First backoff delay between reconnect attempts
+        :param reconnect_max_delay: Backoff delay cap
+        :param reconnect_attempts: Give up after this many failed attempts, None retries forever
+        :param replay_opcodes: Requests sent again if the connection dropped before their response
+        :param rate_limiter: Client-side request budgets, see `vkmax.ratelimit.RateLimiter`
+        :param batch_frames: Let outbound frames queued in one loop iteration go out together
+        :param dedup_opcodes: Identical concurrent requests with these opcodes are sent once
+            and share the response, which callers must not modify
+        :param compression: Negotiate permessage-deflate
+        :param client_max_window_bits: Deflate window (9..15) for outbound frames
+        :param server_max_window_bits: Deflate window (9..15) requested for inbound frames
+        :param compression_memory_level: zlib memLevel (1..9) for outbound frames
+        :param max_frame_size: Largest accepted inbound frame in bytes, None for no limit
+        :param session_store: Where to keep the login token, sync markers and entity caches,
+            see `vkmax.sessions`. Saved after every login and on disconnect
+        :param journal: Records every raw frame sent and received,
+            replay them with `vkmax.journal.replay_journal`
+        :param transfer_timeout: Default seconds to wait for an uploaded video or file
+            to be processed, None waits forever
+        :param attachment_cache: Reuse attachments of already uploaded content
+            in `send_photo` and `send_file`, see `vkmax.attachments`
+        """
+        self._codec: PacketCodec = get_codec(codec, lazy=lazy_packets)
         self._connection: Optional[ClientConnection] = None
         self._http_pool: Optional[aiohttp.ClientSession] = None
         self._is_logged_in: bool = False
         self._device_id: Optional[str] = None
+        self._token: Optional[str] = None
+        self._sync_markers: dict[str, int] = dict.fromkeys(SYNC_MARKERS, 0)
+        self._logins = 0
+        self._login_measurements: dict[str, Optional[dict[str, float]]] = {"full": None, "incremental": None}
         self._seq = itertools.count(1)
         self._keepalive_task: Optional[asyncio.Task] = None
         self._recv_task: Optional[asyncio.Task] = None
+        self._router = PacketRouter()
+        self._dispatcher = PacketDispatcher(
+            self._run_handlers,
+            workers=workers,
+            queue_size=queue_size,
+            overflow=overflow,
+            droppable_opcodes=droppable_opcodes,
+            block_timeout=block_timeout,
+        )
         self._incoming_event_callback = None
         self._reconnect_callback = None
-        self._pending = {}
-        self._video_pending = {}
-        self._file_pending = {}
+        self._request_timeout = request_timeout
+        self._pending: dict[int, asyncio.Future] = {}
+        self._max_pending = 0
+        self._timeouts = 0
+        self._lost_requests = 0
+        self._auto_reconnect = auto_reconnect
+        self._reconnect_min_delay = reconnect_min_delay
+        self._reconnect_max_delay = reconnect_max_delay
+        self._reconnect_attempts = reconnect_attempts
+        self._replay_opcodes = frozenset(replay_opcodes)
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._reconnects = 0
+        self._reconnect_failures = 0
+        self._last_reconnect_latency: Optional[float] = None
+        self._replayed_requests = 0
+        self._rate_limiter = rate_limiter
+        self._writer = FrameWriter(self._send_frame, batch=batch_frames)
+        self._dedup_opcodes = frozenset(dedup_opcodes)
+        self._singleflight = SingleFlight()
+        self._extensions = deflate_extensions(
+            client_max_window_bits,
+            server_max_window_bits,
+            compression_memory_level,
+        ) if compression else None
+        self._max_frame_size = max_frame_size
+        self._traffic = TrafficCounter()
+        self._session_store = session_store
+        self._warm_start: Optional[dict[str, Any]] = None
+        self._journal = journal
+
+        # batched, cached profile lookups: `await client.users.load(user_id)`
+        self.users = UserLoader(self)
+        self._router.add_handler(self.users.on_contact_update, opcode=CONTACT_UPDATE_OPCODE)
+        # chat metadata without round trips: `client.chats.title(chat_id)`
+        self.chats = ChatRegistry(self)
+        self._router.add_handler(self.chats.on_chat_update, opcode=CHAT_UPDATE_OPCODE)
+        # uploads waiting for server-side processing
+        self.transfers = TransferManager(timeout=transfer_timeout)
+        # parallel, resumable media downloads: `await client.downloads.download(url, path)`
+        self.downloads = Downloader(self)
+        self.attachment_cache = attachment_cache
 
     # --- WebSocket connection management ---
 
@@ -50,61 +193,261 @@ class MaxClient:
         if self._connection:
             raise Exception("Already connected")
 
-        _logger.info(f'Connecting to {WS_HOST}...')
-        self._connection = await websockets.connect(
-            WS_HOST,
-            origin=websockets.Origin('https://web.max.ru'),
-            user_agent_header=USER_AGENT
-        )
+        self._connection = await self._open_connection()
 
+        self._dispatcher.start()
+        self._writer.start()
         self._recv_task = asyncio.create_task(self._recv_loop())
         _logger.info('Connected. Receive task started.')
         return self._connection
 
+    async def _open_connection(self) -> ClientConnection:
+        _logger.info(f'Connecting to {WS_HOST}...')
+        return await websockets.connect(
+            WS_HOST,
+            origin=websockets.Origin('https://web.max.ru'),
+            user_agent_header=USER_AGENT,
+            compression=None,
+            extensions=self._extensions,
+            max_size=self._max_frame_size,
+        )
+
     @ensure_connected
     async def disconnect(self):
-        await self._stop_keepalive_task()
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._keepalive_task:
+            await self._stop_keepalive_task()
+        if self._is_logged_in:
+            await self.save_session()
         self._recv_task.cancel()
         await self._connection.close()
         self._connection = None
+        self._fail_pending(ConnectionLost('Client disconnected'))
+        self._fail_transfers(ConnectionLost('Client disconnected'))
+        await self._writer.stop()
+        await self._dispatcher.stop()
+        if self._journal:
+            self._journal.flush()
         if self._http_pool:
             await self._http_pool.close()
             self._http_pool = None
 
     @ensure_connected
-    async def invoke_method(self, opcode: int, payload: dict[str, Any], retries: int = 2):
-        seq = next(self._seq)
-
-        request = {
-            "ver": RPC_VERSION,
-            "cmd": 0,
-            "seq": seq,
-            "opcode": opcode,
-            "payload": payload
-        }
-        _logger.info(f'-> REQUEST: {request}')
+    async def invoke_method(
+        self,
+        opcode: int,
+        payload: dict[str, Any],
+        retries: int = 2,
+        timeout: Optional[float] = None,
+        priority: Optional[int] = None,
+    ) -> Optional[MaxPacket]:
+        """
+        Sends a request and waits for the response with the same seq.
+        If the connection drops, the request is sent again after reconnecting when it
+        never reached the server or its opcode is in `replay_opcodes`.
+        :param retries: How many times the request may be sent again
+        :param timeout: Seconds to wait for the response, defaults to `request_timeout`
+        :param priority: Outbound lane from `vkmax.writer`, use `PRIORITY_BULK` for mass jobs
+        :raises RequestTimeout: No response in time
+        :raises ConnectionLost: Connection was closed while waiting
+        """
+        if opcode in self._dedup_opcodes:
+            key = (opcode, json.dumps(payload, sort_keys=True, default=str))
+            return await self._singleflight.do(
+                key,
+                lambda: self._invoke(opcode, payload, retries, timeout, priority),
+                group=opcode,
+            )
 
-        future = asyncio.get_event_loop().create_future()
-        self._pending[seq] = future
+        return await self._invoke(opcode, payload, retries, timeout, priority)
+
+    async def _invoke(
+        self,
+        opcode: int,
+        payload: dict[str, Any],
+        retries: int,
+        timeout: Optional[float],
+        priority: Optional[int],
+    ) -> MaxPacket:
+        if timeout is None:
+            timeout = self._request_timeout
+        if priority is None:
+            priority = PRIORITY_CONTROL if opcode in CONTROL_OPCODES else PRIORITY_INTERACTIVE
+
+        attempt = 0
+        while True:
+            await self._wait_reconnected(timeout)
+            if self._rate_limiter:
+                await self._rate_limiter.acquire(opcode)
+
+            seq = next(self._seq)
+            request = {
+                "ver": RPC_VERSION,
+                "cmd": 0,
+                "seq": seq,
+                "opcode": opcode,
+                "payload": payload
+            }
+            _logger.info(f'-> REQUEST: {request}')
 
-        try:
-            await self._connection.send(
-                json.dumps(request)
-            )
-        except websockets.exceptions.ConnectionClosed:
-            _logger.warning('got ws disconnect in invoke_method')
-            if self._reconnect_callback:
-                _logger.info('reconnecting')
-                await self._reconnect_callback()
-                if retries > 0:
-                    _logger.info('retrying invoke_method after reconnect')
-                    await self.invoke_method(opcode, payload, retries - 1)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[seq] = future
+            if len(self._pending) > self._max_pending:
+                self._max_pending = len(self._pending)
+
+            try:
+                frame = self._codec.encode(request)
+                self._traffic.outbound(opcode, len(frame))
+                try:
+                    await self._writer.write(frame, priority)
+                except websockets.exceptions.ConnectionClosed as err:
+                    _logger.warning('got ws disconnect in invoke_method')
+                    self._on_connection_lost()
+                    # nothing reached the server, any request is safe to resend
+                    if attempt < retries and self._can_resume():
+                        attempt += 1
+                        continue
+                    raise ConnectionLost(f'Connection closed: {err}') from err
+
+                try:
+                    response = await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    self._timeouts += 1
+                    raise RequestTimeout(f'No response to opcode {opcode} (seq {seq}) in {timeout}s') from None
+                except ConnectionLost:
+                    if attempt < retries and opcode in self._replay_opcodes and self._can_resume():
+                        _logger.info(f'replaying opcode {opcode} after reconnect')
+                        attempt += 1
+                        self._replayed_requests += 1
+                        continue
+                    raise
+            finally:
+                # also covers cancellation of the caller
+                self._pending.pop(seq, None)
+
+            _logger.info(f'<- RESPONSE: {response}')
+
+            if self._rate_limiter:
+                self._rate_limiter.on_response(opcode, response.payload)
+
+            return response
+
+    async def _send_frame(self, frame: bytes):
+        await self._connection.send(frame, text=True)
+        if self._journal:
+            self._journal.append(OUTBOUND, frame)
+
+    def _fail_pending(self, exc: Exception):
+        """
+        Fails every request waiting for a response.
+        Uploads are tracked across reconnects and fail only in `_fail_transfers`.
+        """
+        waiting = list(self._pending.values())
+        self._pending.clear()
+
+        for future in waiting:
+            if not future.done():
+                future.set_exception(exc)
+                # the owner may have stopped waiting already, e.g. after a failed send
+                future.exception()
+                self._lost_requests += 1
+
+    def _fail_transfers(self, exc: Exception):
+        """Fails uploads waiting for processing once no connection will come back"""
+        self._lost_requests += self.transfers.fail_all(exc)
+
+    # --- Reconnect engine ---
+
+    def _can_reconnect(self) -> bool:
+        return (
+            self._auto_reconnect
+            and self._is_logged_in
+            and bool(self._token or self._reconnect_callback)
+        )
+
+    def _can_resume(self) -> bool:
+        # requests made by the reconnect itself must fail fast
+        return self._can_reconnect() and asyncio.current_task() is not self._reconnect_task
+
+    def _on_connection_lost(self):
+        if self._can_reconnect():
+            if not self._reconnect_task or self._reconnect_task.done():
+                self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+        elif self._reconnect_callback:
+            _logger.info('reconnecting')
+            asyncio.create_task(self._reconnect_callback())
+
+    async def _wait_reconnected(self, timeout: Optional[float]):
+        task = self._reconnect_task
+        if not task or task.done() or task is asyncio.current_task():
             return
 
-        response = await future
-        _logger.info(f'<- RESPONSE: {response}')
+        try:
+            reconnected = await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            raise RequestTimeout(f'Not reconnected in {timeout}s') from None
+        if not reconnected:
+            raise ConnectionLost('Reconnect failed')
+
+    async def _reconnect_loop(self) -> bool:
+        started = time.monotonic()
+        delay = self._reconnect_min_delay
+        attempt = 0
 
-        return response
+        while True:
+            attempt += 1
+            _logger.info(f'reconnecting, attempt {attempt}')
+            try:
+                await self._reconnect()
+            except asyncio.CancelledError:
+                raise
+            except LoginError as err:
+                # retrying a refused token only delays every waiting request
+                self._reconnect_failures += 1
+                _logger.error(f'server refused the session, not reconnecting: {err}')
+                self._is_logged_in = False
+                self._fail_transfers(ConnectionLost(f'Login refused: {err}'))
+                return False
+            except Exception as err:
+                self._reconnect_failures += 1
+                _logger.warning(f'reconnect attempt {attempt} failed: {err!r}')
+                if self._reconnect_attempts is not None and attempt >= self._reconnect_attempts:
+                    _logger.error('giving up reconnecting')
+                    self._is_logged_in = False
+                    self._fail_transfers(ConnectionLost('Reconnect failed'))
+                    return False
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, self._reconnect_max_delay)
+                continue
+
+            self._reconnects += 1
+            self._last_reconnect_latency = time.monotonic() - started
+            _logger.info(f'reconnected in {self._last_reconnect_latency:.2f}s')
+            return True
+
+    async def _reconnect(self):
+        if self._keepalive_task:
+            await self._stop_keepalive_task()
+        if self._recv_task:
+            self._recv_task.cancel()
+        # the writer may have noticed the dead socket first, the receiver will not fail these now
+        self._fail_pending(ConnectionLost('Connection replaced by reconnect'))
+        try:
+            await self._connection.close()
+        except Exception:
+            pass
+
+        if self._reconnect_callback:
+            # user-managed reconnect, kept for compatibility
+            await self._reconnect_callback()
+            return
+
+        self._connection = await self._open_connection()
+        self._recv_task = asyncio.create_task(self._recv_loop())
+        # restarts keepalive as well
+        await self.login_by_token(self._token, self._device_id)
 
     async def set_callback(self, function):
         import warnings
@@ -112,11 +455,51 @@ class MaxClient:
         self.set_packet_callback(function)
 
     def set_packet_callback(self, function):
+        """Sets the single callback receiving every packet"""
         if not asyncio.iscoroutinefunction(function):
             raise TypeError('callback must be async')
+        if self._incoming_event_callback:
+            self._router.remove_handler(self._incoming_event_callback)
         self._incoming_event_callback = function
+        self._router.add_handler(function)
+
+    def add_handler(
+        self,
+        handler: PacketHandler,
+        opcode: Optional[int] = None,
+        chat_id: Union[int, Collection[int], None] = None,
+        predicate: Optional[PacketPredicate] = None,
+    ):
+        """
+        Subscribes an async `handler(client, packet)` to incoming packets.
+        Packets nobody is subscribed to are dropped without creating a task.
+        :param opcode: Opcode to handle, None for every packet
+        :param chat_id: Only packets from this chat (or one of these chats)
+        :param predicate: Additional sync filter called with the packet
+        """
+        self._router.add_handler(handler, opcode, chat_id, predicate)
+
+    def remove_handler(self, handler: PacketHandler, opcode: Optional[int] = None):
+        self._router.remove_handler(handler, opcode)
+
+    def on(
+        self,
+        opcode: Optional[int] = None,
+        chat_id: Union[int, Collection[int], None] = None,
+        predicate: Optional[PacketPredicate] = None,
+    ):
+        """Decorator version of `add_handler`"""
+        def decorator(handler: PacketHandler) -> PacketHandler:
+            self.add_handler(handler, opcode, chat_id, predicate)
+            return handler
+
+        return decorator
 
     def set_reconnect_callback(self, function):
+        """
+        Replaces the built-in session restore with a custom coroutine.
+        It is still retried with backoff when `auto_reconnect` is enabled.
+        """
         if not asyncio.iscoroutinefunction(function):
             raise TypeError('callback must be async')
         self._reconnect_callback = function
@@ -124,8 +507,8 @@ class MaxClient:
     async def _recv_loop(self):
         while True:
             try:
-                packet = await self._connection.recv()
-                packet = json.loads(packet)
+                # raw UTF-8, codecs parse bytes directly
+                frame = await self._connection.recv(decode=False)
 
             except asyncio.CancelledError:
                 _logger.info('receiver cancelled')
@@ -133,42 +516,67 @@ class MaxClient:
 
             except websockets.exceptions.ConnectionClosedError as err:
                 _logger.warning('got ws disconnect in receiver')
+                self._fail_pending(ConnectionLost(f'Connection closed: {err}'))
                 if not self._is_logged_in:
                     raise err
-                if self._reconnect_callback:
-                    _logger.info('reconnecting')
-                    asyncio.create_task(self._reconnect_callback())
+                self._on_connection_lost()
                 return
 
-            except websockets.exceptions.ConnectionClosedOK:
+            except websockets.exceptions.ConnectionClosedOK as err:
+                self._fail_pending(ConnectionLost('Connection closed by server'))
+                if err.rcvd is not None and err.rcvd.code == 1001:
+                    # going away: server restart or maintenance
+                    _logger.warning('server is going away')
+                    if self._is_logged_in:
+                        self._on_connection_lost()
+                    return
                 # this probably means that user logged out
                 _logger.warning('connection closed')
                 return
 
-            except json.JSONDecodeError:
-                _logger.warning('could not decode packet')
-                continue
+            if self._journal:
+                self._journal.append(INBOUND, frame)
+            await self._handle_frame(frame)
+
+    async def _handle_frame(self, frame: bytes):
+        try:
+            packet = self._codec.decode(frame)
+        except ValueError:
+            _logger.warning('could not decode packet')
+            return
 
-            seq = packet["seq"]
-            future = self._pending.pop(seq, None)
-            if future:
+        self._traffic.inbound(packet.opcode, len(frame))
+        await self._dispatch_packet(packet)
+
+    async def _dispatch_packet(self, packet: MaxPacket):
+        """Resolves a waiting request or passes the packet to handlers"""
+        future = self._pending.pop(packet.seq, None)
+        if future:
+            if not future.done():
                 future.set_result(packet)
-                continue
+            return
 
-            if packet.get("opcode") == 136:
-                payload = packet.get("payload", {})
-                future = None
+        # a lazy packet parses its payload here, on the first access
+        try:
+            if packet.opcode == TRANSFER_PROCESSED_OPCODE:
+                self.transfers.on_processed(packet.payload)
+
+            await self._route_packet(packet)
+        except ValueError:
+            _logger.warning(f'could not decode payload of opcode {packet.opcode}')
 
-                if "videoId" in payload:
-                    future = self._video_pending.pop(payload["videoId"], None)
-                elif "fileId" in payload:
-                    future = self._file_pending.pop(payload["fileId"], None)
+    async def _route_packet(self, packet: MaxPacket):
+        """Passes the packet to subscribed handlers, without touching requests or transfers"""
+        handlers = self._router.resolve(packet)
+        if handlers:
+            await self._dispatcher.submit(handlers, packet)
 
-                if future:
-                    future.set_result(None)
-            
-            if self._incoming_event_callback:
-                asyncio.create_task(self._incoming_event_callback(self, packet))
+    async def _run_handlers(self, handlers: list[PacketHandler], packet: MaxPacket):
+        for handler in handlers:
+            try:
+                await handler(self, packet)
+            except Exception:
+                _logger.exception(f'handler {getattr(handler, "__qualname__", handler)} failed on opcode {packet.opcode}')
 
     # --- Keepalive system
 
@@ -184,11 +592,17 @@ class MaxClient:
         _logger.info(f'keepalive task started')
         try:
             while True:
-                await self._send_keepalive_packet()
+                try:
+                    await self._send_keepalive_packet()
+                except RequestTimeout:
+                    _logger.warning('keepalive got no response')
                 await asyncio.sleep(30)
         except asyncio.CancelledError:
             _logger.info('keepalive task stopped')
             return
+        except ConnectionLost:
+            _logger.warning('keepalive stopped by connection loss')
+            return
 
     @ensure_connected
     async def _start_keepalive_task(self):
@@ -268,24 +682,44 @@ class MaxClient:
             _logger.warning('Got no phone number in server response')
         _logger.info(f'Successfully logged in as {phone}')
 
+        try:
+            self._token = verification_response["payload"]["tokenAttrs"]["LOGIN"]["token"]
+        except KeyError:
+            _logger.warning('Got no login token in server response, reconnect will not resume the session')
+
         self._is_logged_in = True
         await self._start_keepalive_task()
+        await self.save_session()
 
         return verification_response
 
     @ensure_connected
-    async def login_by_token(self, token: str, device_id: Optional[str] = None):
+    async def login_by_token(
+        self,
+        token: str,
+        device_id: Optional[str] = None,
+        sync_markers: Optional[dict[str, int]] = None,
+    ):
+        """
+        :param sync_markers: Markers saved from `client.sync_markers` after a previous login.
+            The server then sends only changes since that login, so pass them only together
+            with the state (chats, contacts) that login produced.
+            By default markers of the previous login on this client are used.
+        """
+        if sync_markers is not None:
+            self._sync_markers.update(sync_markers)
+        incremental = any(self._sync_markers.values())
+
         await self._send_hello_packet(device_id)
         _logger.info("using session")
+        started = time.monotonic()
+        received = self._traffic.inbound_bytes(19)
         login_response = await self.invoke_method(
             opcode=19,
             payload={
                 "interactive": True,
                 "token": token,
-                "chatsSync": 0,
-                "contactsSync": 0,
-                "presenceSync": 0,
-                "draftsSync": 0,
+                **self._sync_markers,
                 "chatsCount": 40,
                 "userAgent": {
                     "deviceType": "DESKTOP", 
@@ -304,7 +738,7 @@ class MaxClient:
         )
 
         if "error" in login_response["payload"]:
-            raise Exception(login_response["payload"]["error"])
+            raise LoginError(login_response["payload"]["error"])
 
         try:
             phone = login_response["payload"]["profile"]["contact"]["phone"]
@@ -313,11 +747,132 @@ class MaxClient:
             _logger.warning('Got no phone number in server response')
         _logger.info(f'Successfully logged in as {phone}')
 
+        self._logins += 1
+        self._login_measurements["incremental" if incremental else "full"] = {
+            "latency": time.monotonic() - started,
+            "bytes": self._traffic.inbound_bytes(19) - received,
+        }
+
+        self.chats.ingest_login(login_response.payload)
+        self._update_sync_markers(login_response.payload)
+
+        self._token = token
         self._is_logged_in = True
         await self._start_keepalive_task()
+        await self.save_session()
 
         return login_response
 
+    @ensure_connected
+    async def login_from_session(self) -> bool:
+        """
+        Logs in with the session from `session_store`, restoring cached users and chats
+        and resuming incremental sync from the saved markers.
+        Returns False if there is no saved session, `send_code` and `sign_in` are needed then.
+        """
+        if self._session_store is None:
+            raise RuntimeError('No session store configured')
+
+        started = time.monotonic()
+        session = await asyncio.to_thread(self._session_store.load)
+        if session is None:
+            return False
+
+        now = time.time()
+        users = 0
+        for user_id, contact, expires_at in session.users:
+            if expires_at is None:
+                self.users.prime(user_id, contact)
+            elif expires_at > now:
+                self.users.cache.set(user_id, contact, expires_at - now)
+            else:
+                continue
+            users += 1
+        self.chats.ingest(session.chats)
+        self._warm_start = {
+            "users": users,
+            "chats": len(session.chats),
+            "age": now - session.saved_at if session.saved_at else None,
+            "load_time": time.monotonic() - started,
+        }
+
+        await self.login_by_token(session.token, session.device_id, sync_markers=session.sync_markers)
+        return True
+
+    async def save_session(self):
+        """Writes the current session to `session_store`, no-op without a store or login token"""
+        if self._session_store is None or not self._token:
+            return
+
+        now = time.time()
+        session = SessionData(
+            device_id=self._device_id,
+            token=self._token,
+            sync_markers=self.sync_markers,
+            users=[
+                (user_id, contact, None if seconds_left is None else now + seconds_left)
+                for user_id, contact, seconds_left in self.users.cache.items()
+            ],
+            chats=[chat for _, chat, _ in self.chats.cache.items()],
+            saved_at=now,
+        )
+        try:
+            await asyncio.to_thread(self._session_store.save, session)
+        except Exception:
+            _logger.exception('Failed to save session')
+
+    def _update_sync_markers(self, payload: dict[str, Any]):
+        # markers the server does not echo are advanced to its clock
+        server_time = payload.get("time")
+        for marker in SYNC_MARKERS:
+            value = payload.get(marker, server_time)
+            if value:
+                self._sync_markers[marker] = value
+
     @property
     def device_id(self) -> Optional[str]:
         return self._device_id
+
+    @property
+    def sync_markers(self) -> dict[str, int]:
+        """State markers of the last login, to be persisted with the session"""
+        return dict(self._sync_markers)
+
+    @property
+    def codec(self) -> PacketCodec:
+        return self._codec
+
+    def stats(self) -> dict[str, Any]:
+        """Runtime counters of client subsystems"""
+        return {
+            "requests": {
+                "pending": len(self._pending),
+                "max_pending": self._max_pending,
+                "timeouts": self._timeouts,
+                "lost": self._lost_requests,
+                "replayed": self._replayed_requests,
+            },
+            "reconnect": {
+                "reconnecting": bool(self._reconnect_task and not self._reconnect_task.done()),
+                "reconnects": self._reconnects,
+                "failed_attempts": self._reconnect_failures,
+                "last_latency": self._last_reconnect_latency,
+            },
+            "dispatcher": self._dispatcher.stats(),
+            "rate_limiter": self._rate_limiter.stats() if self._rate_limiter else None,
+            "writer": self._writer.stats(),
+            "dedup": self._singleflight.stats(),
+            "traffic": self._traffic.stats(),
+            "login": {
+                "logins": self._logins,
+                "sync_markers": self.sync_markers,
+                **self._login_measurements,
+                "warm_start": self._warm_start,
+            },
+            "users": self.users.stats(),
+            "chats": self.chats.stats(),
+            "journal": self._journal.stats() if self._journal else None,
+            "transfers": self.transfers.stats(),
+            "downloads": self.downloads.stats(),
+            "attachments": self.attachment_cache.stats() if self.attachment_cache else None,
+        }
@@ -0,0 +1,183 @@
+import json
+import re
+from typing import Any, Optional, Union
+
+from vkmax.packet import MaxPacket
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+
+Frame = Union[str, bytes]
+
+# `{"ver":11,"cmd":1,"seq":5,"opcode":128,"payload":` with header keys in any order
+_HEADER_FIELD_PATTERN = r'\s*"(ver|cmd|seq|opcode)"\s*:\s*(-?\d+)\s*,'
+_HEADER_PATTERN = r'^\s*\{' + _HEADER_FIELD_PATTERN * 4 + r'\s*"payload"\s*:'
+
+_HEADER_RE = re.compile(_HEADER_PATTERN)
+_HEADER_RE_BYTES = re.compile(_HEADER_PATTERN.encode())
+
+
+class PacketCodec:
+    """Base class for websocket frame (de)serializers"""
+
+    name = "base"
+
+    def __init__(self, lazy: bool = False):
+        """
+        :param lazy: Extract only `ver/cmd/seq/opcode` eagerly
+            and parse the payload on first access
+        """
+        self.lazy = lazy
+
+    def dumps(self, obj: Any) -> bytes:
+        """Serializes to UTF-8 JSON, sent as a text frame"""
+        raise NotImplementedError
+
+    def loads(self, frame: Frame) -> Any:
+        raise NotImplementedError
+
+    def encode(self, packet: dict[str, Any]) -> bytes:
+        return self.dumps(packet)
+
+    def decode(self, frame: Frame) -> MaxPacket:
+        if self.lazy:
+            packet = self._decode_header(frame)
+            if packet is not None:
+                return packet
+        return MaxPacket.from_dict(self.loads(frame))
+
+    def _decode_header(self, frame: Frame) -> Optional[MaxPacket]:
+        if isinstance(frame, str):
+            match = _HEADER_RE.match(frame)
+            if match is None:
+                return None
+            fields = match.groups()
+        else:
+            match = _HEADER_RE_BYTES.match(frame)
+            if match is None:
+                return None
+            fields = [field.decode() for field in match.groups()]
+
+        header = {
+            fields[0]: int(fields[1]),
+            fields[2]: int(fields[3]),
+            fields[4]: int(fields[5]),
+            fields[6]: int(fields[7]),
+        }
+        if len(header) != 4:
+            # duplicated key, let the real parser sort it out
+            return None
+
+        return MaxPacket(
+            ver=header["ver"],
+            cmd=header["cmd"],
+            opcode=header["opcode"],
+            seq=header["seq"],
+            frame=frame,
+            offset=match.end(),
+            loads=self.loads,
+        )
+
+
+class JsonCodec(PacketCodec):
+    """Stdlib `json` codec, always available"""
+
+    name = "json"
+
+    def __init__(self, lazy: bool = False):
+        super().__init__(lazy)
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        self._decoder = json.JSONDecoder()
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj).encode()
+
+    def loads(self, frame: Frame) -> Any:
+        if isinstance(frame, (bytes, bytearray, memoryview)):
+            frame = bytes(frame).decode()
+        return self._decoder.decode(frame)
+
+
+class OrjsonCodec(PacketCodec):
+    """`orjson` codec, requires `pip install orjson`"""
+
+    name = "orjson"
+
+    def __init__(self, lazy: bool = False):
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        super().__init__(lazy)
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, frame: Frame) -> Any:
+        return orjson.loads(frame)
+
+
+class MsgspecCodec(PacketCodec):
+    """`msgspec` codec, requires `pip install msgspec`"""
+
+    name = "msgspec"
+
+    def __init__(self, lazy: bool = False):
+        if msgspec is None:
+            raise ImportError("msgspec is not installed")
+        super().__init__(lazy)
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj)
+
+    def loads(self, frame: Frame) -> Any:
+        try:
+            return self._decoder.decode(frame)
+        except msgspec.DecodeError as err:
+            # callers only expect ValueError from decoding
+            raise ValueError(str(err)) from err
+
+
+CODECS = {
+    codec.name: codec
+    for codec in (OrjsonCodec, MsgspecCodec, JsonCodec)
+}
+
+
+def available_codecs() -> list[str]:
+    """Names of codecs usable in the current environment"""
+
+    available = []
+    if orjson is not None:
+        available.append(OrjsonCodec.name)
+    if msgspec is not None:
+        available.append(MsgspecCodec.name)
+    available.append(JsonCodec.name)
+    return available
+
+
+def get_codec(codec: Union[str, PacketCodec, None] = None, lazy: bool = False) -> PacketCodec:
+    """
+    Resolves a codec instance.
+    :param codec: Codec name, instance, or None for the fastest available one
+    :param lazy: Enable header-only decoding, ignored for codec instances
+    """
+
+    if isinstance(codec, PacketCodec):
+        return codec
+
+    if codec is None:
+        codec = available_codecs()[0]
+
+    try:
+        return CODECS[codec](lazy=lazy)
+    except KeyError:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {list(CODECS)}") from None
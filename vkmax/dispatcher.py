@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Collection, Optional
+
+from vkmax.packet import MaxPacket
+from vkmax.router import PacketHandler
+
+_logger = logging.getLogger(__name__)
+
+# wait for queue space, applying backpressure to the websocket reader;
+# after `block_timeout` the oldest queued packet is dropped
+OVERFLOW_BLOCK = "block"
+# discard the oldest queued packet of the same worker
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+# discard new packets of `droppable_opcodes`, block for the rest
+OVERFLOW_DROP_OPCODES = "drop_opcodes"
+
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_OPCODES)
+
+_Job = tuple[list[PacketHandler], MaxPacket]
+
+
+class PacketDispatcher:
+    """
+    Fixed pool of workers running packet handlers.
+
+    Packets are sharded by `payload.chatId` (opcode for chatless packets),
+    so each chat is processed sequentially while different chats run in parallel.
+    Every worker owns a bounded queue of `queue_size // workers` packets.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[list[PacketHandler], MaxPacket], Awaitable[Any]],
+        workers: int = 4,
+        queue_size: int = 1024,
+        overflow: str = OVERFLOW_BLOCK,
+        droppable_opcodes: Collection[int] = (),
+        block_timeout: Optional[float] = 5.0,
+    ):
+        """
+        :param run: Coroutine function executing handlers for a packet
+        :param workers: Number of concurrent workers
+        :param queue_size: Total capacity of worker queues
+        :param overflow: One of `OVERFLOW_POLICIES`
+        :param droppable_opcodes: Opcodes discarded under `OVERFLOW_DROP_OPCODES`
+        :param block_timeout: How long a blocked reader waits before dropping the
+            oldest packet. Responses are read by the same reader, so a handler awaiting
+            `invoke_method` could otherwise deadlock against a full queue. None waits forever.
+        """
+
+        if workers < 1:
+            raise ValueError('workers must be positive')
+        if queue_size < workers:
+            raise ValueError('queue_size must be at least the number of workers')
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow must be one of {OVERFLOW_POLICIES}')
+        if overflow == OVERFLOW_DROP_OPCODES and not droppable_opcodes:
+            raise ValueError('droppable_opcodes are required for the drop_opcodes policy')
+
+        self._run = run
+        self._overflow = overflow
+        self._droppable_opcodes = frozenset(droppable_opcodes)
+        self._block_timeout = block_timeout
+        self._worker_count = workers
+        self._worker_queue_size = queue_size // workers
+        # created in start() so that queues bind to the running loop
+        self._queues: list[asyncio.Queue] = []
+        self._workers: list[asyncio.Task] = []
+
+        self._max_depth = 0
+        self._processed = 0
+        self._blocked = 0
+        self._dropped: Counter = Counter()
+
+    def start(self):
+        if self._workers:
+            return
+        self._queues = [
+            asyncio.Queue(maxsize=self._worker_queue_size) for _ in range(self._worker_count)
+        ]
+        self._workers = [
+            asyncio.create_task(self._worker(queue)) for queue in self._queues
+        ]
+
+    async def stop(self):
+        """Cancels workers and discards queued packets"""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._queues = []
+
+    async def join(self):
+        """Waits until every queued packet is handled"""
+        for queue in self._queues:
+            await queue.join()
+
+    async def submit(self, handlers: list[PacketHandler], packet: MaxPacket):
+        """Queues a packet for its chat's worker according to the overflow policy"""
+        chat_id = packet.payload.get("chatId")
+        key = chat_id if chat_id is not None else packet.opcode
+        queue = self._queues[hash(key) % len(self._queues)]
+        job = (handlers, packet)
+
+        if queue.full():
+            if self._overflow == OVERFLOW_DROP_OLDEST:
+                self._drop_oldest(queue)
+            elif self._overflow == OVERFLOW_DROP_OPCODES and packet.opcode in self._droppable_opcodes:
+                self._drop(packet)
+                return
+            else:
+                await self._put_blocking(queue, job)
+                return
+
+        queue.put_nowait(job)
+        self._track_depth(queue)
+
+    async def _put_blocking(self, queue: asyncio.Queue, job: _Job):
+        self._blocked += 1
+        try:
+            await asyncio.wait_for(queue.put(job), self._block_timeout)
+        except asyncio.TimeoutError:
+            _logger.warning(f'handler queue stayed full for {self._block_timeout}s, dropping oldest packet')
+            if queue.full():
+                self._drop_oldest(queue)
+            queue.put_nowait(job)
+        self._track_depth(queue)
+
+    def _drop(self, packet: MaxPacket):
+        self._dropped[packet.opcode] += 1
+
+    def _drop_oldest(self, queue: asyncio.Queue):
+        self._drop(queue.get_nowait()[1])
+        # the dropped packet counts as handled, otherwise join() waits for it forever
+        queue.task_done()
+
+    def _track_depth(self, queue: asyncio.Queue):
+        depth = queue.qsize()
+        if depth > self._max_depth:
+            self._max_depth = depth
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            handlers, packet = await queue.get()
+            try:
+                await self._run(handlers, packet)
+            except Exception:
+                _logger.exception('packet dispatch failed')
+            finally:
+                queue.task_done()
+            self._processed += 1
+
+    def stats(self) -> dict[str, Any]:
+        depths = [queue.qsize() for queue in self._queues]
+        return {
+            "workers": self._worker_count,
+            "capacity": self._worker_count * self._worker_queue_size,
+            "depth": sum(depths),
+            "worker_depths": depths,
+            "max_worker_depth": self._max_depth,
+            "processed": self._processed,
+            "blocked": self._blocked,
+            "dropped": sum(self._dropped.values()),
+            "dropped_by_opcode": dict(self._dropped),
+        }
@@ -0,0 +1,312 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+import aiohttp
+
+from vkmax.progress import TransferProgress
+
+_logger = logging.getLogger(__name__)
+
+_CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-\d+/(\d+)')
+
+PathLike = Union[str, os.PathLike]
+
+
+class DownloadProgress(TransferProgress):
+    """State of one download, passed to progress callbacks"""
+
+    __slots__ = ("path",)
+
+    def __init__(self, path: Path, total: Optional[int], resumed_from: int = 0):
+        # total is None when the server does not report the size,
+        # bytes resumed from disk are not counted in the speed
+        super().__init__(total, skipped=resumed_from)
+        self.path = path
+
+    @property
+    def received(self) -> int:
+        return self.transferred
+
+    @received.setter
+    def received(self, value: int):
+        self.transferred = value
+
+    @property
+    def resumed_from(self) -> int:
+        return self.skipped
+
+    @resumed_from.setter
+    def resumed_from(self, value: int):
+        self.skipped = value
+
+
+ProgressCallback = Callable[[DownloadProgress], Any]
+
+
+class _RangeIgnored(Exception):
+    """The server answered a range request with something other than that range"""
+
+
+class Downloader:
+    """
+    Downloads media to disk over the client's HTTP pool.
+
+    Files larger than `part_size` are fetched with up to `parts` concurrent
+    range requests. Data goes to `<path>.part` next to a small JSON state file,
+    so an interrupted download continues where each range stopped,
+    even after the process was killed.
+    """
+
+    def __init__(
+        self,
+        client,
+        parts: int = 4,
+        part_size: int = 8 * 2 ** 20,
+        chunk_size: int = 2 ** 16,
+        retries: int = 3,
+        progress_interval: float = 0.1,
+        state_interval: float = 1.0,
+    ):
+        """
+        :param parts: Concurrent range requests per file
+        :param part_size: Smallest range worth a separate request
+        :param chunk_size: Bytes read and written at once, bounds memory per request
+        :param retries: Attempts per range after a network error
+        :param progress_interval: Seconds between progress callbacks
+        :param state_interval: Seconds between saves of the resume state
+        """
+        self._client = client
+        self._parts = max(1, parts)
+        self._part_size = part_size
+        self._chunk_size = chunk_size
+        self._retries = retries
+        self._progress_interval = progress_interval
+        self._state_interval = state_interval
+
+        self._active = 0
+        self._completed = 0
+        self._resumed = 0
+        self._bytes = 0
+        self._time = 0.0
+
+    def _session(self) -> aiohttp.ClientSession:
+        if not self._client._http_pool:
+            self._client._http_pool = aiohttp.ClientSession()
+        return self._client._http_pool
+
+    async def download(
+        self,
+        url: str,
+        path: PathLike,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Path:
+        """Saves the URL to `path`, returns the path once the file is complete"""
+
+        path = Path(path)
+        part_path = path.with_name(path.name + ".part")
+        state_path = path.with_name(path.name + ".part.json")
+
+        self._active += 1
+        started = time.monotonic()
+        try:
+            total, ranges_supported = await self._probe(url)
+            ranges = self._load_state(state_path, part_path, total) if ranges_supported else None
+            if ranges is None:
+                ranges = self._split(total) if ranges_supported else [[0, None, 0]]
+                self._preallocate(part_path, total)
+            else:
+                self._resumed += 1
+                _logger.info(f'resuming download of {path}')
+
+            state = DownloadProgress(path, total, sum(offset - start for start, _, offset in ranges))
+
+            def save_state():
+                if ranges_supported:
+                    self._save_state(state_path, total, ranges)
+
+            save_state()
+            reporter = _Reporter(progress, state, self._progress_interval, save_state, self._state_interval)
+            try:
+                await self._fetch_ranges(url, part_path, ranges, state, reporter, ranged=ranges_supported)
+            except _RangeIgnored:
+                _logger.warning(f'server ignored range requests for {path}, downloading as a single stream')
+                ranges_supported = False
+                state_path.unlink(missing_ok=True)
+                ranges = [[0, None, 0]]
+                state.received = state.resumed_from = 0
+                self._preallocate(part_path, total)
+                await self._fetch_ranges(url, part_path, ranges, state, reporter, ranged=False)
+            except BaseException:
+                save_state()
+                raise
+
+            os.replace(part_path, path)
+            state_path.unlink(missing_ok=True)
+            reporter.report(force=True)
+
+            self._completed += 1
+            self._bytes += state.received - state.resumed_from
+            self._time += time.monotonic() - started
+            return path
+        finally:
+            self._active -= 1
+
+    async def size(self, url: str) -> Optional[int]:
+        """Size of the resource in bytes, None if the server does not tell"""
+        total, _ = await self._probe(url)
+        return total
+
+    async def _probe(self, url: str) -> tuple[Optional[int], bool]:
+        """Total size and whether the server accepts range requests"""
+        async with self._session().get(url, headers={"Range": "bytes=0-0"}) as resp:
+            resp.raise_for_status()
+            if resp.status == 206:
+                match = _CONTENT_RANGE_RE.match(resp.headers.get("Content-Range", ""))
+                if match:
+                    return int(match.group(2)), True
+            return resp.content_length, False
+
+    def _split(self, total: int) -> list[list]:
+        """`[start, end (inclusive), next offset to fetch]` per range"""
+        if not total:
+            return [[0, -1, 0]]
+        count = max(1, min(self._parts, total // self._part_size))
+        size = -(-total // count)
+        return [
+            [start, min(start + size, total) - 1, start]
+            for start in range(0, total, size)
+        ]
+
+    @staticmethod
+    def _preallocate(part_path: Path, total: Optional[int]):
+        # ranges write at their own offsets
+        with open(part_path, "wb") as file:
+            if total:
+                file.truncate(total)
+
+    @staticmethod
+    def _save_state(state_path: Path, total: Optional[int], ranges: list[list]):
+        # a kill in the middle of writing leaves the previous state intact
+        temp_path = state_path.with_name(state_path.name + ".tmp")
+        temp_path.write_text(json.dumps({"total": total, "ranges": ranges}))
+        os.replace(temp_path, state_path)
+
+    @staticmethod
+    def _load_state(state_path: Path, part_path: Path, total: Optional[int]) -> Optional[list[list]]:
+        if not (state_path.exists() and part_path.exists()):
+            return None
+        try:
+            saved = json.loads(state_path.read_text())
+        except ValueError:
+            return None
+        # the file changed on the server, start over
+        if saved.get("total") != total:
+            return None
+        return saved["ranges"]
+
+    async def _fetch_ranges(
+        self,
+        url: str,
+        part_path: Path,
+        ranges: list[list],
+        state: DownloadProgress,
+        reporter: "_Reporter",
+        ranged: bool,
+    ):
+        tasks = [
+            asyncio.ensure_future(self._fetch_range(url, part_path, item, state, reporter, ranged))
+            for item in ranges
+            if item[1] is None or item[2] <= item[1]
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # stop the other ranges before the state is saved or the file rewritten
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _fetch_range(
+        self,
+        url: str,
+        part_path: Path,
+        item: list,
+        state: DownloadProgress,
+        reporter: "_Reporter",
+        ranged: bool,
+    ):
+        start, end, _ = item
+        attempt = 0
+        # unbuffered, so the saved offsets never run ahead of the data handed to the OS
+        with open(part_path, "r+b", buffering=0) as file:
+            while True:
+                headers = {}
+                if ranged:
+                    headers["Range"] = f"bytes={item[2]}-{end}"
+                try:
+                    async with self._session().get(url, headers=headers) as resp:
+                        resp.raise_for_status()
+                        if ranged:
+                            match = _CONTENT_RANGE_RE.match(resp.headers.get("Content-Range", ""))
+                            if resp.status != 206 or not match or int(match.group(1)) != item[2]:
+                                raise _RangeIgnored()
+                        file.seek(item[2])
+                        async for chunk in resp.content.iter_chunked(self._chunk_size):
+                            await asyncio.to_thread(file.write, chunk)
+                            item[2] += len(chunk)
+                            state.received += len(chunk)
+                            reporter.report()
+                    return
+                except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                    if not ranged or attempt >= self._retries:
+                        raise
+                    attempt += 1
+                    _logger.warning(f'range {start}-{end} failed at {item[2]} ({err}), retrying')
+                    await asyncio.sleep(min(2 ** attempt * 0.5, 10))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "active": self._active,
+            "completed": self._completed,
+            "resumed": self._resumed,
+            "bytes": self._bytes,
+            "bytes_per_sec": self._bytes / self._time if self._time else 0.0,
+        }
+
+
+class _Reporter:
+    """Calls the progress callback and saves the resume state, each at most once per its interval"""
+
+    __slots__ = ("_callback", "_state", "_interval", "_reported", "_save", "_save_interval", "_saved")
+
+    def __init__(
+        self,
+        callback: Optional[ProgressCallback],
+        state: DownloadProgress,
+        interval: float,
+        save: Callable[[], Any],
+        save_interval: float,
+    ):
+        self._callback = callback
+        self._state = state
+        self._interval = interval
+        self._reported = 0.0
+        self._save = save
+        self._save_interval = save_interval
+        self._saved = time.monotonic()
+
+    def report(self, force: bool = False):
+        now = time.monotonic()
+        if now - self._saved >= self._save_interval:
+            self._saved = now
+            self._save()
+        if self._callback is not None and (force or now - self._reported >= self._interval):
+            self._reported = now
+            self._callback(self._state)
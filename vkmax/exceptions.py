@@ -0,0 +1,17 @@
+import asyncio
+
+
+class MaxError(Exception):
+    """Base class for vkmax errors"""
+
+
+class ConnectionLost(MaxError):
+    """Connection was closed before the response arrived"""
+
+
+class RequestTimeout(MaxError, asyncio.TimeoutError):
+    """Server did not respond in time"""
+
+
+class LoginError(MaxError):
+    """Server refused the login, e.g. the token was revoked"""
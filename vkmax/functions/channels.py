@@ -20,14 +20,19 @@ async def resolve_channel_id(
     client: MaxClient,
     channel_id: int
 ):
-    """Resolve channel by id"""
+    """
+    Resolve channel by id.
+    For cached metadata without a round trip see `client.chats`
+    """
 
-    return await client.invoke_method(
+    response = await client.invoke_method(
         opcode=48,
         payload={
             "chatIds": [channel_id]
         }
     )
+    client.chats.ingest(response["payload"].get("chats", []))
+    return response
 
 
 async def join_channel(
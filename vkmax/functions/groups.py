@@ -1,6 +1,12 @@
-from vkmax.client import MaxClient
+import time
+from array import array
+from bisect import bisect_left
 from random import randint
-from typing import Optional
+from typing import Any, AsyncIterator, Iterable, Iterator, Optional
+
+from vkmax.client import MaxClient
+from vkmax.paging import PageIterator
+from vkmax.writer import PRIORITY_BULK
 
 
 async def create_group(
@@ -211,6 +217,7 @@ async def get_group_members(
 ):
     """
     Gets all the members in specified chat.
+    One page only, `iter_group_members` follows the markers.
     :param marker: User ID to begin with
     """
 
@@ -228,6 +235,169 @@ async def get_group_members(
     )
 
 
+def _member_id(member: dict[str, Any]) -> Optional[int]:
+    if "id" in member:
+        return member["id"]
+    return (member.get("contact") or {}).get("id")
+
+
+class MemberIterator(PageIterator):
+    """
+    All members of a group, following opcode 59 markers.
+
+    Markers chain the pages, so they can not be requested in parallel;
+    instead they are prefetched as described in `vkmax.paging.PageIterator`.
+    """
+
+    _item_name = "members"
+
+    def __init__(
+        self,
+        client: MaxClient,
+        group_id: int,
+        page_size: int = 500,
+        prefetch: int = 2,
+        priority: int = PRIORITY_BULK,
+    ):
+        if page_size > 500:
+            raise Exception("Maximum available count is 500")
+
+        super().__init__(prefetch)
+        self._client = client
+        self._group_id = group_id
+        self._page_size = page_size
+        self._priority = priority
+
+    async def _fetch_pages(self) -> AsyncIterator[list[dict[str, Any]]]:
+        marker = 0
+        while True:
+            response = await self._client.invoke_method(
+                opcode=59,
+                payload={
+                    "type": "MEMBER",
+                    "marker": marker,
+                    "chatId": self._group_id,
+                    "count": self._page_size
+                },
+                priority=self._priority,
+            )
+
+            if "error" in response.payload:
+                raise Exception(response.payload["error"])
+
+            members = response.payload.get("members", [])
+            yield members
+
+            next_marker = response.payload.get("marker")
+            if not members or not next_marker or next_marker == marker:
+                return
+            marker = next_marker
+
+    async def ids(self) -> AsyncIterator[int]:
+        """Member ids only, the member objects are dropped right away"""
+        async for member in self:
+            member_id = _member_id(member)
+            if member_id is not None:
+                yield member_id
+
+
+def iter_group_members(
+    client: MaxClient,
+    group_id: int,
+    page_size: int = 500,
+    prefetch: int = 2,
+) -> MemberIterator:
+    """
+    Iterates over all members of the group: `async for member in iter_group_members(client, group_id)`
+    :param page_size: Members per request, up to 500
+    :param prefetch: Pages fetched ahead of the caller
+    """
+
+    return MemberIterator(client, group_id, page_size=page_size, prefetch=prefetch)
+
+
+class MemberSnapshot:
+    """
+    Member ids of a group at some moment, stored as a sorted 64-bit array
+    (8 bytes per member), compared with a linear merge instead of sets.
+    """
+
+    __slots__ = ("_ids", "taken_at")
+
+    def __init__(self, ids: Iterable[int] = (), taken_at: Optional[float] = None):
+        self._ids = array("q", sorted(set(ids)))
+        self.taken_at = time.time() if taken_at is None else taken_at
+
+    @classmethod
+    def _from_sorted(cls, ids: array, taken_at: float) -> "MemberSnapshot":
+        snapshot = cls.__new__(cls)
+        snapshot._ids = ids
+        snapshot.taken_at = taken_at
+        return snapshot
+
+    @classmethod
+    def frombytes(cls, data: bytes, taken_at: Optional[float] = None) -> "MemberSnapshot":
+        """Loads a snapshot saved with `tobytes`"""
+        ids = array("q")
+        ids.frombytes(data)
+        return cls._from_sorted(ids, time.time() if taken_at is None else taken_at)
+
+    def tobytes(self) -> bytes:
+        return self._ids.tobytes()
+
+    def difference(self, other: "MemberSnapshot") -> "MemberSnapshot":
+        """Ids present in this snapshot but not in `other`"""
+        result = array("q")
+        theirs = other._ids
+        j, their_count = 0, len(theirs)
+        for member_id in self._ids:
+            while j < their_count and theirs[j] < member_id:
+                j += 1
+            if j == their_count or theirs[j] != member_id:
+                result.append(member_id)
+        return self._from_sorted(result, self.taken_at)
+
+    __sub__ = difference
+
+    def diff(self, previous: "MemberSnapshot") -> tuple["MemberSnapshot", "MemberSnapshot"]:
+        """`(joined, left)` since the previous snapshot"""
+        return self.difference(previous), previous.difference(self)
+
+    def __contains__(self, member_id: int) -> bool:
+        ids = self._ids
+        index = bisect_left(ids, member_id)
+        return index < len(ids) and ids[index] == member_id
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, MemberSnapshot):
+            return NotImplemented
+        return self._ids == other._ids
+
+    def __repr__(self) -> str:
+        return f'MemberSnapshot({len(self._ids)} members, taken_at={self.taken_at})'
+
+
+async def take_member_snapshot(
+    client: MaxClient,
+    group_id: int,
+    page_size: int = 500,
+) -> MemberSnapshot:
+    """
+    Fetches the member ids of the group.
+    Compare two snapshots to get joins and leaves: `joined, left = new.diff(old)`
+    """
+
+    taken_at = time.time()
+    ids = [member_id async for member_id in iter_group_members(client, group_id, page_size).ids()]
+    return MemberSnapshot(ids, taken_at=taken_at)
+
+
 async def resolve_group_by_link(
     client: MaxClient,
     link_hash: str
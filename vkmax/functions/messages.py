@@ -1,15 +1,30 @@
+import asyncio
+import logging
+import time
+from collections import Counter
 from pathlib import Path
 from random import randint
-from typing import Optional, Union
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, Optional, Union
 
+from vkmax.attachments import is_attachment_error
 from vkmax.client import MaxClient
-from vkmax.functions.uploads import upload_photo, upload_file
+from vkmax.exceptions import ConnectionLost, RequestTimeout
+from vkmax.paging import PageIterator
+from vkmax.progress import Stopwatch
+from vkmax.ratelimit import is_flood_error
+from vkmax.functions.uploads import upload_photo, upload_photos, upload_file
+from vkmax.writer import PRIORITY_BULK
 
+_logger = logging.getLogger(__name__)
 
 # common backward-compatible type
 # for functions accepting a message id
 MessageId = Union[str, int]
 
+# history directions for `iter_history`
+BACKWARD = "backward"
+FORWARD = "forward"
+
 
 async def send_message(
     client: MaxClient,
@@ -17,15 +32,21 @@ async def send_message(
     text: str,
     notify: bool = True,
     reply_to: Optional[MessageId] = None,
-    attaches: list = []
+    attaches: list = [],
+    priority: Optional[int] = None,
+    cid: Optional[int] = None,
 ):
-    """Sends message to specified chat"""
+    """
+    Sends message to specified chat
+    :param priority: Outbound lane, see `vkmax.writer`
+    :param cid: Client message id, reuse it when resending the same message
+    """
 
     payload = {
         "chatId": chat_id,
         "message": {
             "text": text,
-            "cid": randint(1750000000000, 2000000000000),
+            "cid": cid if cid is not None else randint(1750000000000, 2000000000000),
             "elements": [],
             "link": None,
             "attaches": attaches
@@ -44,6 +65,7 @@ async def send_message(
     return await client.invoke_method(
         opcode=64,
         payload=payload,
+        priority=priority,
     )
 
 
@@ -130,13 +152,37 @@ async def send_photo(
 
     """Sends photo to specified chat"""
 
-    with open(image_path, 'rb') as stream:
-        photo = await upload_photo(client, chat_id, stream)
+    async def upload() -> dict:
+        with open(image_path, 'rb') as stream:
+            return await upload_photo(client, chat_id, stream)
+
+    return await _send_attachment(
+        client, chat_id, caption, notify,
+        image_path, "photo", None, upload,
+    )
+
+
+async def send_photos(
+        client: MaxClient,
+        chat_id: int,
+        image_paths: list[str],
+        caption: str,
+        notify: bool = True
+    ):
+
+    """Sends several photos in one message, uploaded in parallel"""
+
+    streams = [open(image_path, 'rb') for image_path in image_paths]
+    try:
+        photos = await upload_photos(client, chat_id, streams)
+    finally:
+        for stream in streams:
+            stream.close()
 
     return await send_message(
         client, chat_id, caption,
         notify=notify,
-        attaches=[photo],
+        attaches=photos,
     )
 
 
@@ -152,14 +198,371 @@ async def send_file(
 
     file_path: Path = Path(file_path)
 
-    with file_path.open('rb') as stream:
-        file = await upload_file(
-            client, chat_id, stream,
-            filename=file_path.name,
+    async def upload() -> dict:
+        with file_path.open('rb') as stream:
+            return await upload_file(
+                client, chat_id, stream,
+                filename=file_path.name,
+            )
+
+    return await _send_attachment(
+        client, chat_id, caption, notify,
+        file_path, "file", file_path.name, upload,
+    )
+
+
+async def _send_attachment(
+        client: MaxClient,
+        chat_id: int,
+        caption: str,
+        notify: bool,
+        path: Union[str, Path],
+        kind: str,
+        filename: Optional[str],
+        upload: Callable[[], Awaitable[dict]],
+    ):
+
+    """Sends a message with one attachment, reusing a cached one for the same content"""
+
+    cache = client.attachment_cache
+    if cache is None:
+        return await send_message(
+            client, chat_id, caption,
+            notify=notify,
+            attaches=[await upload()],
         )
 
+    key = cache.key(kind, await cache.digest(path), filename)
+    attach = await cache.get(key)
+    if attach is not None:
+        response = await send_message(
+            client, chat_id, caption,
+            notify=notify,
+            attaches=[attach],
+        )
+        # other errors, throttling included, are not fixed by uploading again
+        if not is_attachment_error(response.payload):
+            return response
+        # expired on the server, upload again
+        await cache.reject(key)
+
+    attach = await cache.upload(key, upload)
     return await send_message(
         client, chat_id, caption,
         notify=notify,
-        attaches=[file],
+        attaches=[attach],
+    )
+
+
+class HistoryIterator(PageIterator):
+    """
+    Messages of a chat fetched page by page with opcode 49,
+    prefetched as described in `vkmax.paging.PageIterator`.
+    """
+
+    _item_name = "messages"
+
+    def __init__(
+        self,
+        client: MaxClient,
+        chat_id: int,
+        direction: str = BACKWARD,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        page_size: int = 50,
+        prefetch: int = 2,
+        limit: Optional[int] = None,
+        priority: int = PRIORITY_BULK,
+    ):
+        if direction not in (BACKWARD, FORWARD):
+            raise ValueError(f'Unknown history direction: {direction}')
+
+        super().__init__(prefetch, limit)
+        self._client = client
+        self._chat_id = chat_id
+        self._direction = direction
+        self._since = since
+        self._until = until
+        self._page_size = page_size
+        self._priority = priority
+
+    async def _fetch_pages(self) -> AsyncIterator[list[dict[str, Any]]]:
+        backward = self._direction == BACKWARD
+        if backward:
+            cursor = self._until if self._until is not None else int(time.time() * 1000)
+        else:
+            cursor = self._since if self._since is not None else 0
+
+        # pages overlap at the cursor timestamp, messages from there are skipped once seen
+        seen_at_cursor: set = set()
+
+        while True:
+            response = await self._client.invoke_method(
+                opcode=49,
+                payload={
+                    "chatId": self._chat_id,
+                    "from": cursor,
+                    "forward": 0 if backward else self._page_size,
+                    "backward": self._page_size if backward else 0,
+                    "getMessages": True
+                },
+                priority=self._priority,
+            )
+
+            page = [
+                message
+                for message in response.payload.get("messages", [])
+                if message.get("id") not in seen_at_cursor
+            ]
+            page.sort(key=lambda message: message.get("time", 0), reverse=backward)
+
+            in_range = [message for message in page if self._in_range(message)]
+            yield in_range
+            if not page or len(in_range) < len(page):
+                # no more messages, or walked past the requested time range
+                return
+
+            cursor = page[-1].get("time", cursor)
+            seen_at_cursor = {message.get("id") for message in page if message.get("time") == cursor}
+
+    def _in_range(self, message: dict[str, Any]) -> bool:
+        sent_at = message.get("time", 0)
+        if self._since is not None and sent_at < self._since:
+            return False
+        if self._until is not None and sent_at > self._until:
+            return False
+        return True
+
+
+def iter_history(
+    client: MaxClient,
+    chat_id: int,
+    direction: str = BACKWARD,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    page_size: int = 50,
+    prefetch: int = 2,
+    limit: Optional[int] = None,
+) -> HistoryIterator:
+    """
+    Iterates over chat messages: `async for message in iter_history(client, chat_id)`
+
+    :param direction: BACKWARD from `until` (default now) to older messages,
+        FORWARD from `since` (default the beginning) to newer ones
+    :param since: Oldest message time to include, unix milliseconds
+    :param until: Newest message time to include, unix milliseconds
+    :param page_size: Messages per request
+    :param prefetch: Pages fetched ahead of the caller, bounds memory use
+    :param limit: Stop after this many messages
+    """
+
+    return HistoryIterator(
+        client, chat_id,
+        direction=direction,
+        since=since,
+        until=until,
+        page_size=page_size,
+        prefetch=prefetch,
+        limit=limit,
+    )
+
+
+# broadcast errors after which the message may or may not have reached the server
+UNCERTAIN_ERRORS = frozenset(("timeout", "connection_lost"))
+
+
+class BroadcastResult:
+    """Outcome of sending a broadcast to one chat"""
+
+    __slots__ = ("chat_id", "response", "error", "attempts")
+
+    def __init__(self, chat_id: int, response=None, error: Any = None, attempts: int = 1):
+        self.chat_id = chat_id
+        self.response = response
+        # None when the message was sent; server errors are not always strings
+        self.error = str(error) if error is not None else None
+        self.attempts = attempts
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def uncertain(self) -> bool:
+        """The send was interrupted, the chat may have got the message anyway"""
+        return self.error in UNCERTAIN_ERRORS
+
+    def __repr__(self) -> str:
+        status = "ok" if self.ok else self.error
+        return f'BroadcastResult(chat_id={self.chat_id}, {status}, attempts={self.attempts})'
+
+
+class Broadcast:
+    """
+    One message sent to many chats with up to `concurrency` requests in flight.
+
+    Requests go through the client's rate limiter and the bulk writer lane,
+    so interactive traffic is not delayed. Throttling errors are retried with backoff.
+    After a timeout or a lost connection the message may already be posted,
+    so these are reported as `uncertain` results unless `retry_uncertain` is set;
+    other errors are reported.
+    Iterate to get results as they complete: `async for result in broadcast(...)`
+    """
+
+    def __init__(
+        self,
+        client: MaxClient,
+        chat_ids: Iterable[int],
+        text: str,
+        attaches: Optional[list] = None,
+        notify: bool = True,
+        concurrency: int = 32,
+        retries: int = 3,
+        retry_delay: float = 1.0,
+        retry_uncertain: bool = False,
+    ):
+        self._client = client
+        self._chat_ids = chat_ids
+        self._text = text
+        self._attaches = attaches or []
+        self._notify = notify
+        self._concurrency = max(1, concurrency)
+        self._retries = retries
+        self._retry_delay = retry_delay
+        self._retry_uncertain = retry_uncertain
+
+        self._sent = 0
+        self._failed = 0
+        self._uncertain = 0
+        self._retried = 0
+        self._in_flight = 0
+        self._failures: Counter = Counter()
+        self._stopwatch = Stopwatch()
+
+    def __aiter__(self) -> AsyncIterator[BroadcastResult]:
+        return self._iterate()
+
+    async def run(self) -> list[BroadcastResult]:
+        """Sends to every chat and returns all results"""
+        return [result async for result in self]
+
+    async def _iterate(self) -> AsyncIterator[BroadcastResult]:
+        chat_ids = iter(self._chat_ids)
+        results = asyncio.Queue(maxsize=self._concurrency * 2)
+        workers = [
+            asyncio.create_task(self._worker(chat_ids, results))
+            for _ in range(self._concurrency)
+        ]
+        self._stopwatch.start()
+        running = len(workers)
+        try:
+            while running:
+                result = await results.get()
+                if result is None:
+                    running -= 1
+                    continue
+                yield result
+        finally:
+            self._stopwatch.stop()
+            for worker in workers:
+                worker.cancel()
+
+    async def _worker(self, chat_ids: Iterator[int], results: asyncio.Queue):
+        try:
+            # the iterator is shared, each chat is taken by one worker
+            for chat_id in chat_ids:
+                self._in_flight += 1
+                try:
+                    result = await self._send(chat_id)
+                except Exception as err:
+                    # reported like any other failure, the worker moves on to the next chat
+                    _logger.exception(f'broadcast to chat {chat_id} failed')
+                    result = BroadcastResult(chat_id, error=type(err).__name__)
+                finally:
+                    self._in_flight -= 1
+
+                if result.ok:
+                    self._sent += 1
+                else:
+                    self._failed += 1
+                    self._failures[result.error] += 1
+                    if result.uncertain:
+                        self._uncertain += 1
+                await results.put(result)
+        finally:
+            await results.put(None)
+
+    async def _send(self, chat_id: int) -> BroadcastResult:
+        # one message, one cid, also across retries
+        cid = randint(1750000000000, 2000000000000)
+        attempt = 0
+        while True:
+            attempt += 1
+            error = None
+            response = None
+            try:
+                response = await send_message(
+                    self._client, chat_id, self._text,
+                    notify=self._notify,
+                    attaches=self._attaches,
+                    priority=PRIORITY_BULK,
+                    cid=cid,
+                )
+            except RequestTimeout:
+                error = "timeout"
+            except ConnectionLost:
+                error = "connection_lost"
+
+            if response is not None:
+                if "error" not in response.payload:
+                    return BroadcastResult(chat_id, response, attempts=attempt)
+                if not is_flood_error(response.payload):
+                    return BroadcastResult(chat_id, response, response.payload["error"], attempt)
+                error = "flood"
+            elif not self._retry_uncertain:
+                return BroadcastResult(chat_id, None, error, attempt)
+
+            if attempt > self._retries:
+                return BroadcastResult(chat_id, response, error, attempt)
+            self._retried += 1
+            await asyncio.sleep(self._retry_delay * 2 ** (attempt - 1))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "sent": self._sent,
+            "failed": self._failed,
+            "uncertain": self._uncertain,
+            "retried": self._retried,
+            "in_flight": self._in_flight,
+            "failures": dict(self._failures),
+            "elapsed": self._stopwatch.elapsed,
+            "messages_per_sec": self._stopwatch.rate(self._sent),
+        }
+
+
+def broadcast(
+    client: MaxClient,
+    chat_ids: Iterable[int],
+    text: str,
+    attaches: Optional[list] = None,
+    notify: bool = True,
+    concurrency: int = 32,
+    retries: int = 3,
+    retry_uncertain: bool = False,
+) -> Broadcast:
+    """
+    Sends the message to every chat, see `Broadcast`.
+    `await broadcast(...).run()` or `async for result in broadcast(...)`
+    :param concurrency: Sends in flight at once
+    :param retries: Extra attempts for throttling errors
+    :param retry_uncertain: Also resend after timeouts and lost connections,
+        which may post the message to a chat twice
+    """
+
+    return Broadcast(
+        client, chat_ids, text, attaches,
+        notify=notify,
+        concurrency=concurrency,
+        retries=retries,
+        retry_uncertain=retry_uncertain,
     )
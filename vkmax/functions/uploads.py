@@ -1,18 +1,163 @@
 import asyncio
+import io
+import os
+import re
+import time
+from dataclasses import dataclass
 from io import BufferedIOBase
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, Optional, Sequence, Union
 
 import aiohttp
+import aiohttp.payload
 from vkmax.client import MaxClient, USER_AGENT
+from vkmax.downloads import ProgressCallback as DownloadProgressCallback
+from vkmax.progress import TransferProgress
+from vkmax.transfers import FILE, VIDEO
 
 
-async def download_video(
+class UploadProgress(TransferProgress):
+    """State of one upload, passed to progress callbacks"""
+
+    __slots__ = ("filename",)
+
+    def __init__(self, filename: str, total: Optional[int]):
+        # total is None for streams of unknown size
+        super().__init__(total)
+        self.filename = filename
+
+    @property
+    def sent(self) -> int:
+        return self.transferred
+
+    @sent.setter
+    def sent(self, value: int):
+        self.transferred = value
+
+
+# called on the event loop thread every PROGRESS_INTERVAL seconds and once the upload is sent
+ProgressCallback = Callable[[UploadProgress], Any]
+PROGRESS_INTERVAL = 0.1
+
+
+class _UploadStream(io.RawIOBase):
+    """
+    Read-only view of the caller's stream for aiohttp.
+
+    aiohttp reads it in 64 KiB chunks from its executor, so memory use does not grow
+    with the file size. Counts read bytes for progress reports
+    and leaves the underlying stream open when aiohttp closes it.
+    """
+
+    def __init__(
+        self,
+        stream: BufferedIOBase,
+        progress: UploadProgress,
+        callback: Optional[ProgressCallback],
+    ):
+        super().__init__()
+        self._stream = stream
+        self._progress = progress
+        self._callback = callback
+        self._loop = asyncio.get_running_loop()
+        self._reported = 0.0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        self._progress.sent += len(chunk)
+        if self._callback is not None:
+            now = time.monotonic()
+            if now - self._reported >= PROGRESS_INTERVAL:
+                self._reported = now
+                self._loop.call_soon_threadsafe(self._callback, self._progress)
+        return chunk
+
+    def seekable(self) -> bool:
+        return self._stream.seekable()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._stream.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._stream.tell()
+
+    def fileno(self) -> int:
+        return self._stream.fileno()
+
+
+class _UploadPayload(aiohttp.payload.IOBasePayload):
+    """
+    Multipart body part streaming an `_UploadStream`.
+
+    aiohttp only sizes streams backed by a file descriptor, the size is passed
+    explicitly so in-memory streams are sent with a Content-Length as well.
+    """
+
+    def __init__(self, value: _UploadStream, size: Optional[int], **kwargs: Any):
+        super().__init__(value, **kwargs)
+        self._known_size = size
+
+    @property
+    def size(self) -> Optional[int]:
+        return self._known_size
+
+
+def _stream_size(stream: BufferedIOBase) -> Optional[int]:
+    """Bytes left from the current position, None for unseekable streams"""
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(position)
+    except (OSError, AttributeError, ValueError):
+        return None
+    return size - position
+
+
+# opcode 83 keys like MP4_720, streaming manifests (HLS, DASH) have no height
+_VIDEO_FORMAT_RE = re.compile(r'^([A-Z0-9]+)_(\d+)$')
+
+# opcode 83 keys that are not video renditions
+_NOT_VIDEO_FORMATS = frozenset(("cache", "EXTERNAL"))
+
+
+@dataclass
+class VideoFormat:
+    """One rendition of a video from the opcode 83 response"""
+
+    name: str
+    url: str
+    container: str
+    height: Optional[int] = None
+    # filled by `select_video_format` when choosing by size
+    size: Optional[int] = None
+
+
+def parse_video_formats(payload: dict) -> list[VideoFormat]:
+    """Renditions in the order the server listed them"""
+
+    formats = []
+    for name, url in payload.items():
+        if name in _NOT_VIDEO_FORMATS or not isinstance(url, str):
+            continue
+        match = _VIDEO_FORMAT_RE.match(name)
+        if match:
+            formats.append(VideoFormat(name, url, match.group(1), int(match.group(2))))
+        else:
+            formats.append(VideoFormat(name, url, name))
+    return formats
+
+
+async def get_video_formats(
         client: MaxClient,
         chat_id: int,
         message_id: str,
         video_id: int,
-    ) -> str:
+    ) -> list[VideoFormat]:
 
-    """Requests a direct link to download the video"""
+    """Requests every available rendition of the video"""
 
     resp = await client.invoke_method(
         opcode=83,
@@ -22,13 +167,83 @@ async def download_video(
             "messageId": message_id
         }
     )
+    return parse_video_formats(resp["payload"])
 
-    formats = resp["payload"]
-    del formats["cache"]
-    del formats["EXTERNAL"]
 
-    # return first url
-    return list(formats.values())[0]
+async def select_video_format(
+        client: MaxClient,
+        formats: list[VideoFormat],
+        max_height: Optional[int] = None,
+        min_height: Optional[int] = None,
+        max_size: Optional[int] = None,
+    ) -> Optional[VideoFormat]:
+
+    """Picks a downloadable rendition (one with a known height)
+
+    By default the best one within `max_height` and `max_size` is picked.
+    With `min_height` the smallest one at least that tall is picked instead.
+    Sizes are requested from the CDN only when `max_size` is given.
+    Returns None if no rendition fits"""
+
+    candidates = [
+        video_format for video_format in formats
+        if video_format.height is not None
+        and (max_height is None or video_format.height <= max_height)
+        and (min_height is None or video_format.height >= min_height)
+    ]
+
+    if max_size is not None and candidates:
+        sizes = await asyncio.gather(*(
+            client.downloads.size(video_format.url) for video_format in candidates
+        ))
+        for video_format, size in zip(candidates, sizes):
+            video_format.size = size
+        candidates = [
+            video_format for video_format in candidates
+            if video_format.size is not None and video_format.size <= max_size
+        ]
+
+    if not candidates:
+        return None
+    if min_height is not None:
+        return min(candidates, key=lambda video_format: video_format.height)
+    return max(candidates, key=lambda video_format: video_format.height)
+
+
+async def download_video(
+        client: MaxClient,
+        chat_id: int,
+        message_id: str,
+        video_id: int,
+        max_height: Optional[int] = None,
+        min_height: Optional[int] = None,
+        max_size: Optional[int] = None,
+        fallback_to_smallest: bool = False,
+    ) -> Optional[str]:
+
+    """Requests a direct link to download the video
+
+    Without criteria returns the first rendition the server lists,
+    otherwise see `select_video_format`.
+    Returns None if no rendition fits, unless `fallback_to_smallest`
+    asks for the smallest one regardless of the limits"""
+
+    formats = await get_video_formats(client, chat_id, message_id, video_id)
+    if not formats:
+        raise Exception("No video formats in server response")
+
+    if max_height is None and min_height is None and max_size is None:
+        return formats[0].url
+
+    selected = await select_video_format(client, formats, max_height, min_height, max_size)
+    if selected is None:
+        if not fallback_to_smallest:
+            return None
+        sized = [video_format for video_format in formats if video_format.height is not None]
+        if not sized:
+            return formats[0].url
+        selected = min(sized, key=lambda video_format: video_format.height)
+    return selected.url
 
 
 async def download_file(
@@ -51,16 +266,58 @@ async def download_file(
     return resp["payload"]["url"]
 
 
+async def save_video(
+        client: MaxClient,
+        chat_id: int,
+        message_id: str,
+        video_id: int,
+        path: Union[str, os.PathLike],
+        progress: Optional[DownloadProgressCallback] = None,
+        max_height: Optional[int] = None,
+        min_height: Optional[int] = None,
+        max_size: Optional[int] = None,
+        fallback_to_smallest: bool = False,
+    ) -> Optional[Path]:
+
+    """Downloads the video to `path` with parallel range requests, resuming a previous attempt.
+    The rendition is chosen as in `download_video`, returns None without downloading if none fits"""
+
+    url = await download_video(
+        client, chat_id, message_id, video_id,
+        max_height, min_height, max_size, fallback_to_smallest,
+    )
+    if url is None:
+        return None
+    return await client.downloads.download(url, path, progress)
+
+
+async def save_file(
+        client: MaxClient,
+        chat_id: int,
+        message_id: str,
+        file_id: int,
+        path: Union[str, os.PathLike],
+        progress: Optional[DownloadProgressCallback] = None,
+    ) -> Path:
+
+    """Downloads the file to `path` with parallel range requests, resuming a previous attempt"""
+
+    url = await download_file(client, chat_id, message_id, file_id)
+    return await client.downloads.download(url, path, progress)
+
+
 async def upload_photo(
         client: MaxClient,
         chat_id: int,
         stream: BufferedIOBase,
+        progress: Optional[ProgressCallback] = None,
     ) -> dict:
 
     """Uploads one photo from the provided I/O stream
 
     Returns an attachment object to use in vkmax.functions.messages
-    as a list item in `attaches` argument"""
+    as a list item in `attaches` argument.
+    The stream is read in chunks and left open"""
 
     resp = await client.invoke_method(
         opcode=80,
@@ -79,6 +336,7 @@ async def upload_photo(
         attach_type="PHOTO",
         filename="image.jpg",
         mimetype="image/jpeg",
+        progress=progress,
     )
     obj = await resp.json()
     token = list(obj['photos'].values())[0]['token']
@@ -93,12 +351,14 @@ async def upload_video(
         client: MaxClient,
         chat_id: int,
         stream: BufferedIOBase,
+        progress: Optional[ProgressCallback] = None,
     ) -> dict:
 
     """Uploads one video from the provided I/O stream
 
     Returns an attachment object to use in vkmax.functions.messages
-    as a list item in `attaches` argument"""
+    as a list item in `attaches` argument.
+    The stream is read in chunks and left open"""
 
     resp = await client.invoke_method(
         opcode=82,
@@ -115,7 +375,7 @@ async def upload_video(
 
     del info, resp
 
-    await _upload(
+    await _tracked(client, VIDEO, video_id, stream, _upload(
         client,
         chat_id,
         upload_url,
@@ -123,11 +383,8 @@ async def upload_video(
         attach_type="VIDEO",
         filename="video.mp4",
         mimetype="video/mp4",
-    )
-
-    future = asyncio.get_running_loop().create_future()
-    client._video_pending[video_id] = future
-    await future
+        progress=progress,
+    ))
 
     return {
         "_type": "VIDEO",
@@ -140,13 +397,15 @@ async def upload_file(
         client: MaxClient,
         chat_id: int,
         stream: BufferedIOBase,
-        filename: str = "file.bin"
+        filename: str = "file.bin",
+        progress: Optional[ProgressCallback] = None,
     ) -> dict:
 
     """Uploads one file from the provided I/O stream
 
     Returns an attachment object to use in vkmax.functions.messages
-    as a list item in `attaches` argument"""
+    as a list item in `attaches` argument.
+    The stream is read in chunks and left open"""
 
     resp = await client.invoke_method(
         opcode=87,
@@ -162,7 +421,7 @@ async def upload_file(
 
     del info, resp
 
-    await _upload(
+    await _tracked(client, FILE, file_id, stream, _upload(
         client,
         chat_id,
         upload_url,
@@ -170,11 +429,8 @@ async def upload_file(
         attach_type="FILE",
         filename=filename,
         mimetype="application/octet-stream",
-    )
-
-    future = asyncio.get_running_loop().create_future()
-    client._file_pending[file_id] = future
-    await future
+        progress=progress,
+    ))
 
     return {
         "_type": "FILE",
@@ -182,6 +438,214 @@ async def upload_file(
     }
 
 
+async def upload_photo_path(
+        client: MaxClient,
+        chat_id: int,
+        path: Union[str, os.PathLike],
+        progress: Optional[ProgressCallback] = None,
+    ) -> dict:
+
+    """Uploads one photo streamed from disk, see `upload_photo`"""
+
+    with open(path, 'rb') as stream:
+        return await upload_photo(client, chat_id, stream, progress=progress)
+
+
+async def upload_video_path(
+        client: MaxClient,
+        chat_id: int,
+        path: Union[str, os.PathLike],
+        progress: Optional[ProgressCallback] = None,
+    ) -> dict:
+
+    """Uploads one video streamed from disk, see `upload_video`.
+    Memory use stays flat for any file size, cancelling the task aborts the upload"""
+
+    with open(path, 'rb') as stream:
+        return await upload_video(client, chat_id, stream, progress=progress)
+
+
+async def upload_file_path(
+        client: MaxClient,
+        chat_id: int,
+        path: Union[str, os.PathLike],
+        filename: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> dict:
+
+    """Uploads one file streamed from disk, see `upload_file`.
+    Memory use stays flat for any file size, cancelling the task aborts the upload
+    :param filename: Name shown in the chat, the file name by default"""
+
+    path = Path(path)
+    with path.open('rb') as stream:
+        return await upload_file(
+            client, chat_id, stream,
+            filename=filename or path.name,
+            progress=progress,
+        )
+
+
+async def upload_photos(
+        client: MaxClient,
+        chat_id: int,
+        streams: Sequence[BufferedIOBase],
+        concurrency: int = 4,
+    ) -> list[dict]:
+
+    """Uploads several photos with one slot request, `concurrency` at a time
+
+    Returns attachment objects in the order of `streams`,
+    ready for the `attaches` argument of vkmax.functions.messages"""
+
+    slots = await _request_slots(client, 80, len(streams))
+    await _notify_upload(client, chat_id, "PHOTO")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(slot: dict, stream: BufferedIOBase) -> dict:
+        async with semaphore:
+            resp = await _post(client, slot["url"], stream, "image.jpg", "image/jpeg")
+            obj = await resp.json()
+        return {
+            "_type": "PHOTO",
+            "photoToken": list(obj['photos'].values())[0]['token'],
+        }
+
+    return await _gather_uploads(map(upload, slots, streams))
+
+
+async def upload_videos(
+        client: MaxClient,
+        chat_id: int,
+        streams: Sequence[BufferedIOBase],
+        concurrency: int = 4,
+    ) -> list[dict]:
+
+    """Uploads several videos with one slot request, `concurrency` at a time
+
+    Returns attachment objects in the order of `streams`
+    once the server has processed every video"""
+
+    slots = await _request_slots(client, 82, len(streams))
+    await _notify_upload(client, chat_id, "VIDEO")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(slot: dict, stream: BufferedIOBase):
+        async with semaphore:
+            await _post(client, slot["url"], stream, "video.mp4", "video/mp4")
+
+    async def upload(slot: dict, stream: BufferedIOBase) -> dict:
+        await _tracked(client, VIDEO, slot["videoId"], stream, post(slot, stream))
+        return {
+            "_type": "VIDEO",
+            "videoId": slot["videoId"],
+            "token": slot["token"],
+        }
+
+    return await _gather_uploads(map(upload, slots, streams))
+
+
+async def upload_files(
+        client: MaxClient,
+        chat_id: int,
+        streams: Sequence[BufferedIOBase],
+        filenames: Optional[Sequence[str]] = None,
+        concurrency: int = 4,
+    ) -> list[dict]:
+
+    """Uploads several files with one slot request, `concurrency` at a time
+
+    Returns attachment objects in the order of `streams`
+    once the server has processed every file"""
+
+    if filenames is None:
+        filenames = ["file.bin"] * len(streams)
+
+    slots = await _request_slots(client, 87, len(streams))
+    await _notify_upload(client, chat_id, "FILE")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(slot: dict, stream: BufferedIOBase, filename: str):
+        async with semaphore:
+            await _post(client, slot["url"], stream, filename, "application/octet-stream")
+
+    async def upload(slot: dict, stream: BufferedIOBase, filename: str) -> dict:
+        await _tracked(client, FILE, slot["fileId"], stream, post(slot, stream, filename))
+        return {
+            "_type": "FILE",
+            "fileId": slot["fileId"],
+        }
+
+    return await _gather_uploads(map(upload, slots, streams, filenames))
+
+
+async def _gather_uploads(uploads: Iterable[Awaitable[dict]]) -> list[dict]:
+    """Results in order; if one upload fails the others are cancelled before the error is raised,
+    so none keeps reading a stream the caller is about to close"""
+
+    tasks = [asyncio.ensure_future(upload) for upload in uploads]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _request_slots(
+        client: MaxClient,
+        opcode: int,
+        count: int,
+    ) -> list[dict]:
+
+    """Requests `count` upload slots with one call"""
+
+    resp = await client.invoke_method(
+        opcode=opcode,
+        payload={
+            "count": count
+        }
+    )
+
+    if "info" in resp["payload"]:
+        slots = resp["payload"]["info"]
+    else:
+        # photo slots come as one url accepting every photo
+        slots = [{"url": resp["payload"]["url"]}] * count
+
+    if len(slots) < count:
+        raise Exception(f"Requested {count} upload slots, got {len(slots)}")
+
+    return slots
+
+
+async def _tracked(
+        client: MaxClient,
+        kind: str,
+        transfer_id: int,
+        stream: BufferedIOBase,
+        upload: Awaitable,
+    ):
+
+    """Runs `upload` and waits until the server has processed the transfer.
+    Interest is registered first, the notification may come before the upload returns"""
+
+    transfer = client.transfers.expect(kind, transfer_id)
+    size = _stream_size(stream)
+    try:
+        await upload
+    except BaseException:
+        client.transfers.discard(transfer)
+        raise
+
+    transfer.uploaded(size)
+    await client.transfers.wait(transfer)
+
+
 async def _upload(
         client: MaxClient,
         chat_id: int,
@@ -190,10 +654,21 @@ async def _upload(
         attach_type: str,
         filename: str,
         mimetype: str,
+        progress: Optional[ProgressCallback] = None,
     ) -> aiohttp.ClientResponse:
 
     """Internal helper function"""
 
+    await _notify_upload(client, chat_id, attach_type)
+    return await _post(client, url, stream, filename, mimetype, progress)
+
+
+async def _notify_upload(
+        client: MaxClient,
+        chat_id: int,
+        attach_type: str,
+    ):
+
     await client.invoke_method(
         opcode=65,
         payload={
@@ -202,6 +677,16 @@ async def _upload(
         }
     )
 
+
+async def _post(
+        client: MaxClient,
+        url: str,
+        stream: BufferedIOBase,
+        filename: str,
+        mimetype: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> aiohttp.ClientResponse:
+
     headers = {
         'Accept': '*/*',
         'Accept-Language': 'ru-RU,ru;q=0.9',
@@ -216,20 +701,29 @@ async def _upload(
     if not client._http_pool:
         client._http_pool = aiohttp.ClientSession()
 
-    with stream as file:
-        data = aiohttp.FormData()
-        data.add_field(
-            'file', file,
+    size = _stream_size(stream)
+    state = UploadProgress(filename, size)
+    data = aiohttp.FormData()
+    data.add_field(
+        'file',
+        _UploadPayload(
+            _UploadStream(stream, state, progress), size,
             filename=filename,
             content_type=mimetype,
-        )
+        ),
+        filename=filename,
+        content_type=mimetype,
+    )
 
-        resp = await client._http_pool.post(
-            url,
-            headers=headers,
-            data=data,
-        )
-        resp.raise_for_status()
+    resp = await client._http_pool.post(
+        url,
+        headers=headers,
+        data=data,
+    )
+    resp.raise_for_status()
+
+    if progress is not None:
+        progress(state)
 
     # at this point formdata is already sent
     # (i hope so)
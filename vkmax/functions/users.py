@@ -15,6 +15,19 @@ async def resolve_users(
     )
 
 
+async def resolve_user(
+    client: MaxClient,
+    user_id: int
+):
+    """
+    Resolving one user via userid.
+    Lookups made at the same time are sent as one request and cached,
+    returns the contact object or None
+    """
+
+    return await client.users.load(user_id)
+
+
 async def add_to_contacts(client: MaxClient, user_id: int):
     """Adding user to contacts via userid"""
 
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Collection, Iterator, Optional, Union
+
+_logger = logging.getLogger(__name__)
+
+INBOUND = 0
+OUTBOUND = 1
+
+# unix time, direction, frame length; followed by the raw frame
+_RECORD = struct.Struct("<dBI")
+
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".journal"
+
+
+def _segments(directory: Path) -> list[Path]:
+    return sorted(directory.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}"))
+
+
+class PacketJournal:
+    """
+    Append-only log of raw websocket frames, split into segment files.
+
+    Every run starts a new segment, a segment is closed once it grows past
+    `segment_size`. Pass to `MaxClient(journal=...)` to record all traffic.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, os.PathLike],
+        segment_size: int = 64 * 2 ** 20,
+        buffer_size: int = 2 ** 16,
+    ):
+        """
+        :param directory: Where segment files are kept, created if missing
+        :param segment_size: Bytes after which the next segment is started
+        :param buffer_size: Bytes buffered in memory before writing to the file
+        """
+        self._directory = Path(directory)
+        self._segment_size = segment_size
+        self._buffer_size = buffer_size
+        self._file = None
+        self._segment_bytes = 0
+        self._records = 0
+        self._bytes = 0
+        self._segments_written = 0
+
+    def append(self, direction: int, frame: bytes):
+        if self._file is None or self._segment_bytes >= self._segment_size:
+            self._open_segment()
+
+        self._file.write(_RECORD.pack(time.time(), direction, len(frame)))
+        self._file.write(frame)
+        size = _RECORD.size + len(frame)
+        self._segment_bytes += size
+        self._bytes += size
+        self._records += 1
+
+    def _open_segment(self):
+        self.close()
+        self._directory.mkdir(parents=True, exist_ok=True)
+        existing = _segments(self._directory)
+        number = int(existing[-1].name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]) + 1 if existing else 1
+        path = self._directory / f"{_SEGMENT_PREFIX}{number:06d}{_SEGMENT_SUFFIX}"
+        self._file = open(path, "xb", buffering=self._buffer_size)
+        self._segment_bytes = 0
+        self._segments_written += 1
+        _logger.info(f'journal segment {path} opened')
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "records": self._records,
+            "bytes": self._bytes,
+            "segments": self._segments_written,
+        }
+
+
+def read_journal(directory: Union[str, os.PathLike]) -> Iterator[tuple[float, int, bytes]]:
+    """
+    Yields `(unix time, direction, frame)` of every record, oldest first.
+    Segments are memory-mapped; a record cut short by a crash ends its segment.
+    """
+
+    for path in _segments(Path(directory)):
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                continue
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offset, size = 0, len(data)
+                while offset + _RECORD.size <= size:
+                    timestamp, direction, length = _RECORD.unpack_from(data, offset)
+                    offset += _RECORD.size
+                    if offset + length > size:
+                        _logger.warning(f'truncated record at the end of {path}')
+                        break
+                    yield timestamp, direction, data[offset:offset + length]
+                    offset += length
+
+
+async def replay_journal(
+    client,
+    directory: Union[str, os.PathLike],
+    speed: Optional[float] = None,
+    opcodes: Optional[Collection[int]] = None,
+) -> dict[str, Any]:
+    """
+    Feeds journaled inbound packets to the client's handlers, no connection needed.
+
+    Packets go through the same routing and dispatcher as live traffic, but never
+    resolve the client's pending requests or uploads, so a connected client is safe to replay on.
+    Responses to journaled requests are skipped, as they would be consumed by `invoke_method`.
+    Returns once every handler has finished.
+
+    :param speed: None replays as fast as handlers keep up, 1.0 in real time, 2.0 twice as fast
+    :param opcodes: Replay only these opcodes
+    """
+
+    codec = client.codec
+    dispatcher = client._dispatcher
+    offline = client._connection is None
+    if offline:
+        dispatcher.start()
+
+    requests: set[int] = set()
+    frames = dispatched = responses = 0
+    first_timestamp = None
+    started = time.monotonic()
+    try:
+        for timestamp, direction, frame in read_journal(directory):
+            frames += 1
+            try:
+                packet = codec.decode(frame)
+            except ValueError:
+                _logger.warning('could not decode journaled packet')
+                continue
+
+            if direction == OUTBOUND:
+                requests.add(packet.seq)
+                continue
+            if packet.seq in requests:
+                requests.discard(packet.seq)
+                responses += 1
+                continue
+            if opcodes is not None and packet.opcode not in opcodes:
+                continue
+
+            if speed:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                delay = (timestamp - first_timestamp) / speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            try:
+                await client._route_packet(packet)
+            except ValueError:
+                _logger.warning(f'could not decode journaled payload of opcode {packet.opcode}')
+                continue
+            dispatched += 1
+
+        await dispatcher.join()
+    finally:
+        if offline:
+            await dispatcher.stop()
+
+    elapsed = time.monotonic() - started
+    return {
+        "frames": frames,
+        "dispatched": dispatched,
+        "skipped_responses": responses,
+        "elapsed": elapsed,
+        "packets_per_sec": dispatched / elapsed if elapsed else 0.0,
+    }
@@ -0,0 +1,214 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Generic, Hashable, Iterable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+# server notification about a changed contact profile
+CONTACT_UPDATE_OPCODE = 131
+
+
+class TTLCache(Generic[K, V]):
+    """LRU cache whose entries also expire `ttl` seconds after being stored"""
+
+    def __init__(self, maxsize: int = 10_000, ttl: Optional[float] = 300.0):
+        """
+        :param maxsize: Entries kept before evicting the least recently used one
+        :param ttl: Seconds an entry stays valid, None for no expiry
+        """
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: OrderedDict[K, tuple[V, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None):
+        ttl = self._ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else float("inf")
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        if len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: K):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def items(self) -> list[tuple[K, V, Optional[float]]]:
+        """Live entries as `(key, value, seconds left)`, seconds left is None for no expiry"""
+        now = time.monotonic()
+        return [
+            (key, value, None if expires == float("inf") else expires - now)
+            for key, (value, expires) in self._data.items()
+            if expires >= now
+        ]
+
+    def __contains__(self, key: K) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[1] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    DataLoader-style coalescing of single-key lookups.
+
+    Keys requested within `window` seconds are fetched by one `fetch` call
+    (or several, `max_batch` keys each), results are cached in a `TTLCache`.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[list[K]], Awaitable[dict[K, V]]],
+        window: float = 0.005,
+        max_batch: int = 100,
+        cache: Optional[TTLCache] = None,
+    ):
+        """
+        :param fetch: Loads a batch of keys, returns found values by key
+        :param window: Seconds to wait for more keys before fetching
+        :param max_batch: Keys per fetch
+        :param cache: Result cache, a default `TTLCache` if omitted
+        """
+        self._fetch = fetch
+        self._window = window
+        self._max_batch = max_batch
+        self.cache: TTLCache = cache if cache is not None else TTLCache()
+        self._queued: dict[K, asyncio.Future] = {}
+        self._in_flight: dict[K, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches = 0
+        self._loaded_keys = 0
+
+    async def load(self, key: K) -> Optional[V]:
+        """Value for the key, None if the server does not know it"""
+
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        future = self._in_flight.get(key) or self._queued.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._queued[key] = future
+            if len(self._queued) >= self._max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self._window, self._flush)
+
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[K]) -> dict[K, Optional[V]]:
+        keys = list(dict.fromkeys(keys))
+        values = await asyncio.gather(*(self.load(key) for key in keys))
+        return dict(zip(keys, values))
+
+    def prime(self, key: K, value: V):
+        """Stores a value obtained elsewhere, e.g. from an event"""
+        self.cache.set(key, value)
+
+    def invalidate(self, key: K):
+        self.cache.invalidate(key)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._queued = self._queued, {}
+        self._in_flight.update(batch)
+        asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: dict[K, asyncio.Future]):
+        self._batches += 1
+        self._loaded_keys += len(batch)
+        try:
+            values = await self._fetch(list(batch))
+        except Exception as err:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(err)
+                    # retrieved by every waiter, avoid warnings when nobody waits
+                    future.exception()
+            return
+        finally:
+            for key in batch:
+                self._in_flight.pop(key, None)
+
+        for key, future in batch.items():
+            value = values.get(key)
+            if value is not None:
+                self.cache.set(key, value)
+            if not future.done():
+                future.set_result(value)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "batches": self._batches,
+            "avg_batch": self._loaded_keys / self._batches if self._batches else 0.0,
+            "queued": len(self._queued),
+            "in_flight": len(self._in_flight),
+        }
+
+
+class UserLoader(BatchLoader[int, dict]):
+    """Batched opcode 32 lookups of user profiles by id"""
+
+    def __init__(
+        self,
+        client,
+        window: float = 0.005,
+        max_batch: int = 100,
+        cache_size: int = 10_000,
+        ttl: Optional[float] = 300.0,
+    ):
+        super().__init__(self._fetch_users, window, max_batch, TTLCache(cache_size, ttl))
+        self._client = client
+
+    async def _fetch_users(self, user_ids: list[int]) -> dict[int, dict]:
+        response = await self._client.invoke_method(
+            opcode=32,
+            payload={
+                "contactIds": user_ids
+            }
+        )
+        return {
+            contact["id"]: contact
+            for contact in response.payload.get("contacts", [])
+            if "id" in contact
+        }
+
+    async def on_contact_update(self, client, packet):
+        """Packet handler dropping cached profiles changed on the server"""
+        contact = packet.payload.get("contact") or {}
+        if "id" in contact:
+            self.invalidate(contact["id"])
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Any, Iterable, Optional, Union
+
+from vkmax.packet import MaxPacket
+
+_logger = logging.getLogger(__name__)
+
+# opcode 128 message statuses
+STATUS_EDITED = "EDITED"
+STATUS_REMOVED = "REMOVED"
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS messages (
+        chat_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        sender INTEGER,
+        time INTEGER,
+        text TEXT,
+        original_text TEXT,
+        status TEXT,
+        UNIQUE (chat_id, message_id)
+    );
+    CREATE INDEX IF NOT EXISTS messages_chat_time ON messages (chat_id, time);
+"""
+
+# external content index kept in sync by triggers, only the current text is indexed
+_FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        text, content='messages', content_rowid='rowid'
+    );
+    CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+    END;
+    CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+    END;
+    CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE OF text ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+        INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+    END;
+"""
+
+_UPSERT = {
+    None: """
+        INSERT INTO messages (chat_id, message_id, sender, time, text, status)
+        VALUES (?, ?, ?, ?, ?, NULL)
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            sender = excluded.sender, time = excluded.time, text = excluded.text
+        WHERE messages.status IS NULL
+    """,
+    STATUS_EDITED: """
+        INSERT INTO messages (chat_id, message_id, sender, time, text, status)
+        VALUES (?, ?, ?, ?, ?, 'EDITED')
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            original_text = COALESCE(messages.original_text, messages.text),
+            text = excluded.text,
+            status = 'EDITED'
+        WHERE messages.status IS NOT 'REMOVED'
+    """,
+    STATUS_REMOVED: """
+        INSERT INTO messages (chat_id, message_id, sender, time, text, status)
+        VALUES (?, ?, ?, ?, ?, 'REMOVED')
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET status = 'REMOVED'
+    """,
+}
+
+_COLUMNS = ("chat_id", "message_id", "sender", "time", "text", "original_text", "status")
+_SELECT = f"SELECT {', '.join(f'm.{column}' for column in _COLUMNS)} FROM messages m"
+
+
+class MessageStore:
+    """
+    Local SQLite copy of seen messages with full-text search.
+
+    Fed by opcode 128 notifications (`client.add_handler(store.on_message, opcode=128)`)
+    and history pages (`store.add_many`). Writes are queued and committed in batches,
+    all database work runs on one WAL-mode connection in a dedicated thread.
+    """
+
+    def __init__(
+        self,
+        path: str = "max_messages.db",
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+    ):
+        """
+        :param path: Database file
+        :param batch_size: Queued writes that trigger a commit right away
+        :param flush_interval: Seconds queued writes may wait for more to commit together
+        """
+        self._path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._fts = False
+        self._queued: list[tuple[Optional[str], tuple]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+
+        self._written = 0
+        self._rejected = 0
+        self._batches = 0
+        self._max_batch = 0
+        self._write_time = 0.0
+        self._searches = 0
+        self._search_time = 0.0
+
+    async def start(self):
+        if self._task:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vkmax-messages")
+        await self._run(self._open)
+        self._wakeup = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.flush()
+        await self._run(self._close)
+        self._executor.shutdown()
+        self._executor = None
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    # --- executor thread
+
+    def _open(self):
+        self._db = sqlite3.connect(self._path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        try:
+            self._db.executescript(_FTS_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError as err:
+            _logger.warning(f'FTS5 is unavailable ({err}), search falls back to LIKE')
+
+    def _close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    def _write_batch(self, batch: list[tuple[Optional[str], tuple]]) -> int:
+        """Writes the batch, returns how many rows were rejected"""
+        try:
+            with self._db:
+                # consecutive writes of one kind go in one statement, order is kept
+                for status, rows in groupby(batch, key=lambda item: item[0]):
+                    self._db.executemany(_UPSERT[status], (row for _, row in rows))
+            return 0
+        except sqlite3.Error as err:
+            _logger.warning(f'batch of {len(batch)} messages failed ({err}), writing them one by one')
+
+        # the batch was rolled back, keep every row the database accepts
+        rejected = 0
+        for status, row in batch:
+            try:
+                with self._db:
+                    self._db.execute(_UPSERT[status], row)
+            except sqlite3.Error as err:
+                rejected += 1
+                _logger.error(f'dropped message {row[1]} of chat {row[0]}: {err}')
+        return rejected
+
+    def _query(self, sql: str, params: tuple) -> list[dict[str, Any]]:
+        return [dict(zip(_COLUMNS, row)) for row in self._db.execute(sql, params)]
+
+    # --- writes
+
+    def add(self, chat_id: int, message: dict[str, Any]):
+        """Queues a message object, its `status` tells new, edited and removed messages apart"""
+        status = message.get("status")
+        if status not in _UPSERT:
+            status = None
+        self._queued.append((status, (
+            chat_id,
+            int(message["id"]),
+            message.get("sender"),
+            message.get("time"),
+            message.get("text"),
+        )))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def add_many(self, chat_id: int, messages: Iterable[dict[str, Any]]):
+        """Queues a page of history, e.g. from `iter_history`"""
+        for message in messages:
+            self.add(chat_id, message)
+
+    async def on_message(self, client, packet: MaxPacket):
+        """Packet handler for opcode 128 notifications"""
+        message = packet.payload.get("message")
+        if message and "id" in message:
+            self.add(packet.payload["chatId"], message)
+
+    async def _writer(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if len(self._queued) < self._batch_size:
+                await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                # keep writing later messages
+                _logger.exception('writing queued messages failed')
+
+    async def flush(self):
+        """Commits queued writes"""
+        async with self._write_lock:
+            batch, self._queued = self._queued, []
+            if not batch:
+                return
+            started = time.monotonic()
+            try:
+                rejected = await self._run(self._write_batch, batch)
+            except BaseException:
+                # not written, goes out with the next flush
+                self._queued[:0] = batch
+                raise
+            self._write_time += time.monotonic() - started
+            self._written += len(batch) - rejected
+            self._rejected += rejected
+            self._batches += 1
+            self._max_batch = max(self._max_batch, len(batch))
+
+    # --- reads, queued writes are committed first
+
+    async def get(self, chat_id: int, message_id: Union[str, int]) -> Optional[dict[str, Any]]:
+        await self.flush()
+        rows = await self._run(
+            self._query,
+            f"{_SELECT} WHERE m.chat_id = ? AND m.message_id = ?",
+            (chat_id, int(message_id)),
+        )
+        return rows[0] if rows else None
+
+    async def search(
+        self,
+        query: str,
+        chat_id: Optional[int] = None,
+        limit: int = 50,
+    ) -> list[dict[str, Any]]:
+        """
+        Messages matching the query, best matches first.
+        With FTS5 the query uses its syntax: words, "phrases", prefix*, AND/OR/NOT
+        """
+        await self.flush()
+        chat_filter = " AND m.chat_id = ?" if chat_id is not None else ""
+        chat_params = (chat_id,) if chat_id is not None else ()
+        if self._fts:
+            sql = (
+                f"{_SELECT} JOIN messages_fts f ON f.rowid = m.rowid "
+                f"WHERE messages_fts MATCH ?{chat_filter} ORDER BY f.rank LIMIT ?"
+            )
+            params = (query, *chat_params, limit)
+        else:
+            sql = f"{_SELECT} WHERE m.text LIKE ?{chat_filter} ORDER BY m.time DESC LIMIT ?"
+            params = (f"%{query}%", *chat_params, limit)
+
+        started = time.monotonic()
+        rows = await self._run(self._query, sql, params)
+        self._searches += 1
+        self._search_time += time.monotonic() - started
+        return rows
+
+    async def edited(self, chat_id: int, limit: int = 100) -> list[dict[str, Any]]:
+        return await self._by_status(chat_id, STATUS_EDITED, limit)
+
+    async def removed(self, chat_id: int, limit: int = 100) -> list[dict[str, Any]]:
+        return await self._by_status(chat_id, STATUS_REMOVED, limit)
+
+    async def _by_status(self, chat_id: int, status: str, limit: int) -> list[dict[str, Any]]:
+        await self.flush()
+        return await self._run(
+            self._query,
+            f"{_SELECT} WHERE m.chat_id = ? AND m.status = ? ORDER BY m.time DESC LIMIT ?",
+            (chat_id, status, limit),
+        )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "fts": self._fts,
+            "queued": len(self._queued),
+            "written": self._written,
+            "rejected": self._rejected,
+            "batches": self._batches,
+            "avg_batch": self._written / self._batches if self._batches else 0.0,
+            "max_batch": self._max_batch,
+            "write_time": self._write_time,
+            "searches": self._searches,
+            "avg_search_time": self._search_time / self._searches if self._searches else 0.0,
+        }
@@ -1,12 +1,116 @@
-from dataclasses import dataclass
-from typing import Literal, Any
+from typing import Any, Callable, Optional, Union
 
 
-@dataclass
 class MaxPacket:
-    # Not used anywhere, but that's going to change soon
-    ver: int
-    cmd: Literal[0, 1]
-    opcode: int
-    seq: int
-    payload: dict[str, Any]
+    """
+    Single protocol packet.
+
+    The payload may be kept as the raw frame and parsed only on first
+    access to `payload` (see `PacketCodec(lazy=True)`).
+    """
+
+    __slots__ = ("ver", "cmd", "seq", "opcode", "_payload", "_frame", "_offset", "_loads")
+
+    def __init__(
+        self,
+        ver: int,
+        cmd: int,
+        opcode: int,
+        seq: int,
+        payload: Optional[dict[str, Any]] = None,
+        frame: Union[str, bytes, None] = None,
+        offset: int = 0,
+        loads: Optional[Callable[[Union[str, bytes]], Any]] = None,
+    ):
+        """
+        :param frame: Raw frame to parse the payload from on demand
+        :param offset: Position in `frame` where the payload value starts
+        :param loads: JSON parser for the raw frame
+        """
+        self.ver = ver
+        self.cmd = cmd
+        self.opcode = opcode
+        self.seq = seq
+        self._payload = payload
+        self._frame = frame
+        self._offset = offset
+        self._loads = loads
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "MaxPacket":
+        return cls(
+            ver=data.get("ver"),
+            cmd=data.get("cmd"),
+            opcode=data.get("opcode"),
+            seq=data.get("seq"),
+            payload=data.get("payload") or {},
+        )
+
+    @property
+    def payload(self) -> dict[str, Any]:
+        if self._payload is None:
+            self._payload = self._materialize() if self._frame is not None else {}
+            self._frame = None
+            self._loads = None
+        return self._payload
+
+    @payload.setter
+    def payload(self, value: dict[str, Any]):
+        self._payload = value
+        self._frame = None
+        self._loads = None
+
+    @property
+    def is_materialized(self) -> bool:
+        """False while the payload is still unparsed JSON"""
+        return self._frame is None
+
+    def _materialize(self) -> dict[str, Any]:
+        frame = self._frame
+        # payload is expected to be the last key: `..."payload":{...}}`
+        end = len(frame.rstrip()) - 1
+        try:
+            return self._loads(frame[self._offset:end]) or {}
+        except ValueError:
+            return self._loads(frame).get("payload") or {}
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "ver": self.ver,
+            "cmd": self.cmd,
+            "seq": self.seq,
+            "opcode": self.opcode,
+            "payload": self.payload,
+        }
+
+    def __repr__(self) -> str:
+        payload = self._payload if self.is_materialized else "<lazy>"
+        return (
+            f"MaxPacket(ver={self.ver}, cmd={self.cmd}, opcode={self.opcode}, "
+            f"seq={self.seq}, payload={payload})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, MaxPacket):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    # dict-style access keeps `packet['payload']` callbacks working
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in _FIELDS
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in _FIELDS:
+            return default
+        return getattr(self, key)
+
+
+_FIELDS = frozenset(("ver", "cmd", "seq", "opcode", "payload"))
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Any, AsyncIterator, Optional
+
+from vkmax.progress import Stopwatch
+
+
+class PageIterator:
+    """
+    Async iterator over items the server returns page by page.
+
+    The next pages are requested in the background while the caller processes
+    the current one, at most `prefetch` pages are kept in memory ahead of the caller.
+    Subclasses implement `_fetch_pages`.
+    """
+
+    # stats key of the number of yielded items
+    _item_name = "items"
+
+    def __init__(self, prefetch: int = 2, limit: Optional[int] = None):
+        """
+        :param prefetch: Pages fetched ahead of the caller, bounds memory use
+        :param limit: Stop after this many items
+        """
+        self._prefetch = max(1, prefetch)
+        self._limit = limit
+
+        self._pages = 0
+        self._items = 0
+        self._waits = 0
+        self._stopwatch = Stopwatch()
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._iterate()
+
+    def _fetch_pages(self) -> AsyncIterator[list]:
+        """Async generator of fetched pages, empty pages are counted but not passed on"""
+        raise NotImplementedError
+
+    async def _iterate(self) -> AsyncIterator[Any]:
+        queue = asyncio.Queue(maxsize=self._prefetch)
+        task = asyncio.create_task(self._fill(queue))
+        self._stopwatch.start()
+        try:
+            while True:
+                if queue.empty():
+                    self._waits += 1
+                page = await queue.get()
+                if page is None:
+                    return
+                if isinstance(page, BaseException):
+                    raise page
+
+                for item in page:
+                    yield item
+                    self._items += 1
+                    if self._limit is not None and self._items >= self._limit:
+                        return
+        finally:
+            self._stopwatch.stop()
+            task.cancel()
+
+    async def _fill(self, queue: asyncio.Queue):
+        try:
+            async for page in self._fetch_pages():
+                self._pages += 1
+                if page:
+                    await queue.put(page)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            await queue.put(err)
+            return
+
+        await queue.put(None)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        `waits` counts pages the caller had to wait for,
+        it stays near zero when prefetching keeps up with processing
+        """
+        return {
+            "pages": self._pages,
+            self._item_name: self._items,
+            "waits": self._waits,
+            "elapsed": self._stopwatch.elapsed,
+            "pages_per_sec": self._stopwatch.rate(self._pages),
+        }
@@ -0,0 +1,61 @@
+import time
+from typing import Optional
+
+
+class Stopwatch:
+    """Wall time of one run, frozen once the run is over"""
+
+    __slots__ = ("started", "finished")
+
+    def __init__(self):
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self.finished = None
+
+    def stop(self):
+        self.finished = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def rate(self, count: float) -> float:
+        """`count` per second of elapsed time"""
+        elapsed = self.elapsed
+        return count / elapsed if elapsed else 0.0
+
+
+class TransferProgress:
+    """Bytes moved by one upload or download, base of the objects passed to progress callbacks"""
+
+    __slots__ = ("total", "transferred", "skipped", "started")
+
+    def __init__(self, total: Optional[int], skipped: int = 0):
+        """
+        :param total: Size in bytes, None when unknown
+        :param skipped: Bytes done before this run, not counted in the speed
+        """
+        self.total = total
+        self.transferred = skipped
+        self.skipped = skipped
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def bytes_per_sec(self) -> float:
+        elapsed = self.elapsed
+        return (self.transferred - self.skipped) / elapsed if elapsed else 0.0
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return min(1.0, self.transferred / self.total)
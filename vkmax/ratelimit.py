@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Collection, Optional
+
+_logger = logging.getLogger(__name__)
+
+# keepalive and authentication must never be delayed
+EXEMPT_OPCODES = frozenset((1, 6, 17, 18, 19))
+
+_FLOOD_ERROR_RE = re.compile(r'flood|too[._-]?many|rate[._-]?limit|throttl', re.IGNORECASE)
+
+
+def is_flood_error(payload: dict[str, Any]) -> bool:
+    """Default check for server throttling errors in a response payload"""
+    error = payload.get("error")
+    return isinstance(error, str) and _FLOOD_ERROR_RE.search(error) is not None
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate * factor` requests per second with bursts of `burst`.
+    `factor` is lowered on throttling and slowly restored on successful responses.
+    """
+
+    __slots__ = ("base_rate", "burst", "factor", "_tokens", "_updated")
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.base_rate = rate
+        self.burst = max(1, burst)
+        self.factor = 1.0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.base_rate * self.factor
+
+    def reserve(self, now: float) -> float:
+        """Takes a token and returns how long to wait before using it"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def drain(self, now: float):
+        self.reserve(now)
+        self._tokens = min(self._tokens, 0.0)
+
+
+class RateLimiter:
+    """
+    Client-side request limiter with a global budget and per-opcode budgets.
+
+    When a response carries a throttling error, the budget of that opcode
+    (or a new adaptive one, if the opcode had none) is halved,
+    then restored step by step with every successful response.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: int = 10,
+        limits: Optional[dict[int, tuple[float, int]]] = None,
+        adaptive_rate: float = 5.0,
+        min_factor: float = 0.05,
+        recovery_step: float = 0.02,
+        exempt_opcodes: Collection[int] = EXEMPT_OPCODES,
+        flood_check: Callable[[dict[str, Any]], bool] = is_flood_error,
+    ):
+        """
+        :param rate: Global requests per second, None for no global budget
+        :param burst: Global burst size
+        :param limits: `{opcode: (requests per second, burst)}`
+        :param adaptive_rate: Base rate of budgets created for throttled opcodes without a limit
+        :param min_factor: Lowest fraction of the base rate throttling can reduce a budget to
+        :param recovery_step: Fraction of the base rate restored per successful response
+        :param exempt_opcodes: Opcodes that are never limited
+        :param flood_check: Tells throttling errors apart by the response payload
+        """
+
+        self._global = TokenBucket(rate, burst) if rate else None
+        self._buckets: dict[int, TokenBucket] = {
+            opcode: TokenBucket(opcode_rate, opcode_burst)
+            for opcode, (opcode_rate, opcode_burst) in (limits or {}).items()
+        }
+        self._adaptive_rate = adaptive_rate
+        self._min_factor = min_factor
+        self._recovery_step = recovery_step
+        self._exempt_opcodes = frozenset(exempt_opcodes)
+        self._flood_check = flood_check
+
+        self._waits: Counter = Counter()
+        self._wait_time: defaultdict = defaultdict(float)
+        self._floods: Counter = Counter()
+
+    async def acquire(self, opcode: int):
+        """Waits until a request with this opcode fits into the budgets"""
+
+        if opcode in self._exempt_opcodes:
+            return
+
+        now = time.monotonic()
+        delay = 0.0
+        bucket = self._buckets.get(opcode)
+        if bucket is not None:
+            delay = bucket.reserve(now)
+        if self._global is not None:
+            delay = max(delay, self._global.reserve(now))
+
+        if delay > 0:
+            self._waits[opcode] += 1
+            self._wait_time[opcode] += delay
+            await asyncio.sleep(delay)
+
+    def on_response(self, opcode: int, payload: dict[str, Any]):
+        """Adapts budgets to the outcome of a request"""
+
+        if opcode in self._exempt_opcodes:
+            return
+
+        if self._flood_check(payload):
+            self._throttle(opcode)
+            return
+
+        bucket = self._buckets.get(opcode)
+        if bucket is not None and bucket.factor < 1.0:
+            bucket.factor = min(1.0, bucket.factor + self._recovery_step)
+        if self._global is not None and self._global.factor < 1.0:
+            self._global.factor = min(1.0, self._global.factor + self._recovery_step)
+
+    def _throttle(self, opcode: int):
+        self._floods[opcode] += 1
+
+        bucket = self._buckets.get(opcode)
+        if bucket is None:
+            bucket = self._buckets[opcode] = TokenBucket(self._adaptive_rate)
+        else:
+            bucket.factor = max(self._min_factor, bucket.factor / 2)
+
+        bucket.drain(time.monotonic())
+        _logger.warning(f'opcode {opcode} is throttled by server, slowing down to {bucket.rate:.2f} rps')
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "global_rate": self._global.rate if self._global else None,
+            "rates": {opcode: bucket.rate for opcode, bucket in self._buckets.items()},
+            "waits": dict(self._waits),
+            "wait_time": dict(self._wait_time),
+            "total_wait_time": sum(self._wait_time.values()),
+            "floods": dict(self._floods),
+        }
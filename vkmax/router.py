@@ -0,0 +1,112 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Collection, Optional, Union
+
+from vkmax.packet import MaxPacket
+
+# async def handler(client, packet)
+PacketHandler = Callable[[Any, MaxPacket], Awaitable[Any]]
+PacketPredicate = Callable[[MaxPacket], bool]
+
+
+class _Subscription:
+    __slots__ = ("handler", "chat_ids", "predicate")
+
+    def __init__(
+        self,
+        handler: PacketHandler,
+        chat_ids: Optional[frozenset],
+        predicate: Optional[PacketPredicate],
+    ):
+        self.handler = handler
+        self.chat_ids = chat_ids
+        self.predicate = predicate
+
+    def matches(self, packet: MaxPacket) -> bool:
+        if self.chat_ids is not None and packet.payload.get("chatId") not in self.chat_ids:
+            return False
+        if self.predicate is not None and not self.predicate(packet):
+            return False
+        return True
+
+
+class PacketRouter:
+    """
+    Opcode-indexed table of packet handlers.
+
+    Handlers registered without an opcode receive every packet.
+    Filters are checked only for packets of the subscribed opcode,
+    so lazily decoded payloads of other packets are never parsed.
+    """
+
+    def __init__(self):
+        self._by_opcode: dict[int, list[_Subscription]] = {}
+        self._catch_all: list[_Subscription] = []
+
+    def add_handler(
+        self,
+        handler: PacketHandler,
+        opcode: Optional[int] = None,
+        chat_id: Union[int, Collection[int], None] = None,
+        predicate: Optional[PacketPredicate] = None,
+    ):
+        """
+        :param opcode: Opcode to subscribe to, None for every packet
+        :param chat_id: Only packets with this `payload.chatId` (or one of these)
+        :param predicate: Sync filter called with the packet
+        """
+
+        if not asyncio.iscoroutinefunction(handler):
+            raise TypeError('handler must be async')
+
+        if chat_id is None:
+            chat_ids = None
+        elif isinstance(chat_id, int):
+            chat_ids = frozenset((chat_id,))
+        else:
+            chat_ids = frozenset(chat_id)
+
+        subscription = _Subscription(handler, chat_ids, predicate)
+        if opcode is None:
+            self._catch_all.append(subscription)
+        else:
+            self._by_opcode.setdefault(opcode, []).append(subscription)
+
+    def remove_handler(self, handler: PacketHandler, opcode: Optional[int] = None):
+        """Removes every subscription of the handler, optionally only for one opcode"""
+
+        if opcode is None:
+            self._catch_all = [s for s in self._catch_all if s.handler is not handler]
+            opcodes = list(self._by_opcode)
+        else:
+            opcodes = [opcode]
+
+        for op in opcodes:
+            subscriptions = [s for s in self._by_opcode.get(op, ()) if s.handler is not handler]
+            if subscriptions:
+                self._by_opcode[op] = subscriptions
+            else:
+                self._by_opcode.pop(op, None)
+
+    def resolve(self, packet: MaxPacket) -> list[PacketHandler]:
+        """Handlers that should receive the packet, empty if nobody is subscribed"""
+
+        subscriptions = self._by_opcode.get(packet.opcode)
+        if not subscriptions and not self._catch_all:
+            return []
+
+        handlers = []
+        for subscription in self._catch_all:
+            if subscription.matches(packet):
+                handlers.append(subscription.handler)
+        if subscriptions:
+            for subscription in subscriptions:
+                if subscription.matches(packet):
+                    handlers.append(subscription.handler)
+        return handlers
+
+    def opcodes(self) -> set[int]:
+        """Opcodes with at least one dedicated handler"""
+        return set(self._by_opcode)
+
+    def __len__(self) -> int:
+        return len(self._catch_all) + sum(map(len, self._by_opcode.values()))
@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+
+PathLike = Union[str, os.PathLike]
+
+
+@dataclass
+class SessionData:
+    """Everything needed to resume a client without a full re-sync"""
+
+    device_id: str
+    token: str
+    sync_markers: dict[str, int] = field(default_factory=dict)
+    # cached profiles as `(user id, contact, unix time it expires at or None)`
+    users: list[tuple[int, dict, Optional[float]]] = field(default_factory=list)
+    chats: list[dict] = field(default_factory=list)
+    saved_at: float = field(default_factory=time.time)
+
+
+class SessionStore:
+    """Base class for session persistence backends"""
+
+    def load(self) -> Optional[SessionData]:
+        raise NotImplementedError
+
+    def save(self, session: SessionData):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class FileSessionStore(SessionStore):
+    """
+    Session in a single JSON file, replaced atomically on save.
+    Also reads the legacy `device_id\\ntoken` format from README examples.
+    """
+
+    def __init__(self, path: PathLike = "max_session.txt"):
+        self._path = Path(path)
+
+    def load(self) -> Optional[SessionData]:
+        if not self._path.exists():
+            return None
+
+        contents = self._path.read_text(encoding="utf-8")
+        try:
+            data = json.loads(contents)
+        except ValueError:
+            device_id, token = contents.strip().split("\n", maxsplit=1)
+            return SessionData(device_id=device_id, token=token)
+
+        return SessionData(
+            device_id=data["device_id"],
+            token=data["token"],
+            sync_markers=data.get("sync_markers", {}),
+            users=[tuple(user) for user in data.get("users", [])],
+            chats=data.get("chats", []),
+            saved_at=data.get("saved_at", 0.0),
+        )
+
+    def save(self, session: SessionData):
+        data = {
+            "device_id": session.device_id,
+            "token": session.token,
+            "sync_markers": session.sync_markers,
+            "users": session.users,
+            "chats": session.chats,
+            "saved_at": session.saved_at,
+        }
+        temp_path = self._path.with_name(self._path.name + ".tmp")
+        temp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp_path, self._path)
+
+    def clear(self):
+        self._path.unlink(missing_ok=True)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session in an SQLite database, entities are stored row per object"""
+
+    def __init__(self, path: PathLike = "max_session.db"):
+        self._path = str(path)
+        with self._connect() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS session (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS entities (
+                    kind TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    expires_at REAL,
+                    PRIMARY KEY (kind, id)
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path)
+
+    def load(self) -> Optional[SessionData]:
+        db = self._connect()
+        try:
+            values = dict(db.execute("SELECT key, value FROM session"))
+            if "token" not in values:
+                return None
+
+            users = [
+                (user_id, json.loads(data), expires_at)
+                for user_id, data, expires_at in db.execute(
+                    "SELECT id, data, expires_at FROM entities WHERE kind = 'user'"
+                )
+            ]
+            chats = [
+                json.loads(data)
+                for (data,) in db.execute("SELECT data FROM entities WHERE kind = 'chat'")
+            ]
+        finally:
+            db.close()
+
+        return SessionData(
+            device_id=values["device_id"],
+            token=values["token"],
+            sync_markers=json.loads(values.get("sync_markers", "{}")),
+            users=users,
+            chats=chats,
+            saved_at=float(values.get("saved_at", 0.0)),
+        )
+
+    def save(self, session: SessionData):
+        values = {
+            "device_id": session.device_id,
+            "token": session.token,
+            "sync_markers": json.dumps(session.sync_markers),
+            "saved_at": str(session.saved_at),
+        }
+        db = self._connect()
+        try:
+            with db:
+                db.executemany("INSERT OR REPLACE INTO session VALUES (?, ?)", values.items())
+                db.execute("DELETE FROM entities")
+                db.executemany(
+                    "INSERT INTO entities VALUES ('user', ?, ?, ?)",
+                    (
+                        (user_id, json.dumps(contact, ensure_ascii=False), expires_at)
+                        for user_id, contact, expires_at in session.users
+                    ),
+                )
+                db.executemany(
+                    "INSERT INTO entities VALUES ('chat', ?, ?, NULL)",
+                    ((chat["id"], json.dumps(chat, ensure_ascii=False)) for chat in session.chats),
+                )
+        finally:
+            db.close()
+
+    def clear(self):
+        db = self._connect()
+        try:
+            with db:
+                db.execute("DELETE FROM session")
+                db.execute("DELETE FROM entities")
+        finally:
+            db.close()
@@ -0,0 +1,48 @@
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls with the same key:
+    the first call runs, the rest await its result.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._hits: Counter = Counter()
+        self._misses: Counter = Counter()
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]], group: Hashable = None) -> Any:
+        """
+        :param key: Identity of the call
+        :param factory: Starts the call if none is in flight
+        :param group: Label the call is counted under in stats
+        """
+
+        task = self._calls.get(key)
+        if task is not None:
+            self._hits[group] += 1
+        else:
+            self._misses[group] += 1
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        # one cancelled caller must not cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # mark the exception retrieved in case every caller went away
+            task.exception()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "hits": dict(self._hits),
+            "misses": dict(self._misses),
+        }
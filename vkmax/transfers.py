@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from vkmax.exceptions import RequestTimeout
+
+_logger = logging.getLogger(__name__)
+
+# server notification that an uploaded video or file is processed
+TRANSFER_PROCESSED_OPCODE = 136
+
+VIDEO = "video"
+FILE = "file"
+
+# payload key identifying the transfer in opcode 136 notifications
+_ID_KEYS = {VIDEO: "videoId", FILE: "fileId"}
+
+
+class Transfer:
+    """One upload waiting for the server to process it"""
+
+    __slots__ = ("kind", "transfer_id", "size", "started", "uploaded_at", "future")
+
+    def __init__(self, kind: str, transfer_id: int, future: asyncio.Future):
+        self.kind = kind
+        self.transfer_id = transfer_id
+        self.size: Optional[int] = None
+        self.started = time.monotonic()
+        self.uploaded_at: Optional[float] = None
+        self.future = future
+
+    def uploaded(self, size: Optional[int]):
+        """Marks the HTTP upload as finished"""
+        self.size = size
+        self.uploaded_at = time.monotonic()
+
+    def info(self) -> dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "kind": self.kind,
+            "id": self.transfer_id,
+            "size": self.size,
+            "state": "processing" if self.uploaded_at is not None else "uploading",
+            "age": now - self.started,
+        }
+
+
+class TransferManager:
+    """
+    Tracks uploads until opcode 136 reports them processed.
+
+    Interest is registered before the upload starts, and notifications that arrive
+    before anyone waits for them are kept for `early_ttl` seconds,
+    so a fast server can not outrun the uploader.
+    """
+
+    def __init__(self, timeout: Optional[float] = 600.0, early_ttl: float = 300.0):
+        """
+        :param timeout: Default seconds to wait for processing after the upload, None waits forever
+        :param early_ttl: Seconds to keep notifications nobody is waiting for yet
+        """
+        self._timeout = timeout
+        self._early_ttl = early_ttl
+        self._active: dict[tuple[str, int], Transfer] = {}
+        self._early: OrderedDict[tuple[str, int], float] = OrderedDict()
+
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._early_hits = 0
+        self._uploaded_bytes = 0
+        self._upload_time = 0.0
+        self._processing_time = 0.0
+
+    def expect(self, kind: str, transfer_id: int) -> Transfer:
+        """Registers interest in a transfer, call before uploading"""
+        key = (kind, transfer_id)
+        transfer = Transfer(kind, transfer_id, asyncio.get_running_loop().create_future())
+        if self._early.pop(key, None) is not None:
+            self._early_hits += 1
+            transfer.future.set_result(None)
+        self._active[key] = transfer
+        return transfer
+
+    async def wait(self, transfer: Transfer, timeout: Optional[float] = None):
+        """Waits until the server has processed the uploaded transfer"""
+        if timeout is None:
+            timeout = self._timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(transfer.future), timeout)
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            raise RequestTimeout(
+                f'{transfer.kind} {transfer.transfer_id} was not processed in {timeout}s'
+            ) from None
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._active.pop((transfer.kind, transfer.transfer_id), None)
+
+        self._completed += 1
+        if transfer.uploaded_at is not None:
+            self._upload_time += transfer.uploaded_at - transfer.started
+            self._processing_time += time.monotonic() - transfer.uploaded_at
+        if transfer.size:
+            self._uploaded_bytes += transfer.size
+
+    def discard(self, transfer: Transfer):
+        """Forgets a transfer whose upload failed"""
+        if self._active.pop((transfer.kind, transfer.transfer_id), None) is not None:
+            self._failed += 1
+
+    def on_processed(self, payload: dict[str, Any]):
+        """Applies an opcode 136 notification, called by the receiver before any handlers"""
+        for kind, id_key in _ID_KEYS.items():
+            if id_key in payload:
+                self._resolve((kind, payload[id_key]))
+
+    def _resolve(self, key: tuple[str, int]):
+        transfer = self._active.get(key)
+        if transfer is not None:
+            if not transfer.future.done():
+                transfer.future.set_result(None)
+            return
+
+        now = time.monotonic()
+        self._early[key] = now
+        while self._early:
+            oldest_key, received = next(iter(self._early.items()))
+            if now - received < self._early_ttl:
+                break
+            del self._early[oldest_key]
+
+    def fail_all(self, exc: Exception) -> int:
+        """Fails every transfer still waiting, returns how many there were"""
+        failed = 0
+        for transfer in self._active.values():
+            if not transfer.future.done():
+                transfer.future.set_exception(exc)
+                # the uploader may still be sending and pick it up later
+                transfer.future.exception()
+                failed += 1
+        return failed
+
+    def active(self) -> list[dict[str, Any]]:
+        return [transfer.info() for transfer in self._active.values()]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "active": len(self._active),
+            "completed": self._completed,
+            "failed": self._failed,
+            "timed_out": self._timed_out,
+            "early_notifications": self._early_hits,
+            "uploaded_bytes": self._uploaded_bytes,
+            "throughput": self._uploaded_bytes / self._upload_time if self._upload_time else 0.0,
+            "avg_processing_time": self._processing_time / self._completed if self._completed else 0.0,
+        }
@@ -0,0 +1,70 @@
+from collections import defaultdict
+from typing import Any, Optional, Sequence
+
+from websockets.extensions.base import ClientExtensionFactory
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
+
+
+def deflate_extensions(
+    client_max_window_bits: Optional[int] = None,
+    server_max_window_bits: Optional[int] = None,
+    memory_level: int = 5,
+) -> Sequence[ClientExtensionFactory]:
+    """
+    permessage-deflate offer for `websockets.connect(extensions=...)`.
+    Smaller windows and memory level use less RAM per connection
+    at the cost of a worse compression ratio.
+    :param client_max_window_bits: 9..15, window for frames we send
+    :param server_max_window_bits: 9..15, window requested for frames the server sends
+    :param memory_level: zlib memLevel 1..9 for compressing outbound frames
+    """
+
+    return [
+        ClientPerMessageDeflateFactory(
+            client_max_window_bits=client_max_window_bits or True,
+            server_max_window_bits=server_max_window_bits,
+            compress_settings={"memLevel": memory_level},
+        )
+    ]
+
+
+class TrafficCounter:
+    """
+    Per-opcode frame and byte counters.
+    Sizes are of the uncompressed JSON, before permessage-deflate.
+    """
+
+    def __init__(self):
+        self._inbound: defaultdict = defaultdict(lambda: [0, 0])
+        self._outbound: defaultdict = defaultdict(lambda: [0, 0])
+
+    def inbound(self, opcode: int, size: int):
+        counter = self._inbound[opcode]
+        counter[0] += 1
+        counter[1] += size
+
+    def outbound(self, opcode: int, size: int):
+        counter = self._outbound[opcode]
+        counter[0] += 1
+        counter[1] += size
+
+    def inbound_bytes(self, opcode: int) -> int:
+        counter = self._inbound.get(opcode)
+        return counter[1] if counter else 0
+
+    @staticmethod
+    def _summary(counters: dict) -> dict[str, Any]:
+        return {
+            "frames": sum(frames for frames, _ in counters.values()),
+            "bytes": sum(size for _, size in counters.values()),
+            "by_opcode": {
+                opcode: {"frames": frames, "bytes": size}
+                for opcode, (frames, size) in sorted(counters.items())
+            },
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "inbound": self._summary(self._inbound),
+            "outbound": self._summary(self._outbound),
+        }
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from vkmax.exceptions import ConnectionLost
+
+_logger = logging.getLogger(__name__)
+
+# keepalive and authentication
+PRIORITY_CONTROL = 0
+# regular requests
+PRIORITY_INTERACTIVE = 1
+# mass jobs that may wait
+PRIORITY_BULK = 2
+
+PRIORITIES = (PRIORITY_CONTROL, PRIORITY_INTERACTIVE, PRIORITY_BULK)
+PRIORITY_NAMES = ("control", "interactive", "bulk")
+
+CONTROL_OPCODES = frozenset((1, 6, 17, 18, 19))
+
+
+class _LaneStats:
+    __slots__ = ("sent", "total_latency", "max_latency")
+
+    def __init__(self):
+        self.sent = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+
+class FrameWriter:
+    """
+    Single task writing every outbound frame to the websocket.
+
+    Frames are taken from priority lanes, so keepalive and authentication
+    overtake interactive requests, and those overtake bulk jobs.
+    """
+
+    def __init__(self, send: Callable[[bytes], Awaitable[Any]], batch: bool = False):
+        """
+        :param send: Coroutine function writing one frame to the connection
+        :param batch: Wait one loop iteration after wakeup so frames queued
+            in the same tick are written back to back
+        """
+        self._send = send
+        self._batch = batch
+        self._lanes: list[deque] = [deque() for _ in PRIORITIES]
+        self._lane_stats = [_LaneStats() for _ in PRIORITIES]
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batches = 0
+        self._max_batch = 0
+
+    def start(self):
+        if self._task:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._fail_queued(ConnectionLost('Client disconnected'))
+
+    def write(self, frame: bytes, priority: int = PRIORITY_INTERACTIVE) -> asyncio.Future:
+        """Queues a frame, the returned future resolves once it is written"""
+        if not self._task:
+            raise RuntimeError('Writer is not running')
+
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[priority].append((frame, future, time.monotonic()))
+        self._wakeup.set()
+        return future
+
+    def _pop(self) -> Optional[tuple[int, tuple]]:
+        for priority, lane in enumerate(self._lanes):
+            if lane:
+                return priority, lane.popleft()
+        return None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._batch:
+                await asyncio.sleep(0)
+
+            batch = 0
+            # re-check lanes after every frame so control frames jump the queue
+            while True:
+                item = self._pop()
+                if item is None:
+                    break
+
+                priority, (frame, future, queued_at) = item
+                if future.cancelled():
+                    continue
+
+                try:
+                    await self._send(frame)
+                except asyncio.CancelledError:
+                    if not future.done():
+                        future.set_exception(ConnectionLost('Client disconnected'))
+                    raise
+                except Exception as err:
+                    if not future.done():
+                        future.set_exception(err)
+                    # the connection is broken, queued frames would fail the same way
+                    self._fail_queued(err)
+                    break
+
+                if not future.done():
+                    future.set_result(None)
+                self._track(priority, time.monotonic() - queued_at)
+                batch += 1
+
+            if batch:
+                self._batches += 1
+                self._max_batch = max(self._max_batch, batch)
+
+    def _track(self, priority: int, latency: float):
+        stats = self._lane_stats[priority]
+        stats.sent += 1
+        stats.total_latency += latency
+        if latency > stats.max_latency:
+            stats.max_latency = latency
+
+    def _fail_queued(self, exc: Exception):
+        for lane in self._lanes:
+            while lane:
+                _, future, _ = lane.popleft()
+                if not future.done():
+                    future.set_exception(exc)
+
+    def stats(self) -> dict[str, Any]:
+        lanes = {}
+        for name, lane, stats in zip(PRIORITY_NAMES, self._lanes, self._lane_stats):
+            lanes[name] = {
+                "queued": len(lane),
+                "sent": stats.sent,
+                "avg_latency": stats.total_latency / stats.sent if stats.sent else 0.0,
+                "max_latency": stats.max_latency,
+            }
+        return {
+            "lanes": lanes,
+            "batches": self._batches,
+            "max_batch": self._max_batch,
+        }